@@ -6,8 +6,225 @@ import sys
 import os
 import re
 import tempfile
+import json
+import time
+import queue
+import signal
+import threading
 from datetime import datetime
 
+from profiling import add_profile_argument, enable as enable_profiling, stage
+from prompt_template import PromptTemplate
+
+CLAUDE_PATH = "/opt/homebrew/bin/claude"
+MARKER_PATTERN = r'<!-- start -->(.*?)<!-- end -->'
+LATENCY_HISTORY_FILE = "analyze_latency_history.json"
+LATENCY_HISTORY_SIZE = 50
+MIN_LATENCY_SAMPLES = 5
+
+
+OUTPUT_FORMAT_INSTRUCTIONS = """请按照以下格式输出结果：
+<!-- start -->
+[你的分析结果在这里]
+<!-- end -->"""
+
+OUTPUT_FORMAT_REMINDER = "请严格按照上述输出格式，把结果放在 <!-- start --> 和 <!-- end --> 之间。"
+
+
+def build_combined_prompt(prompt_content, sections, extra_instructions=()):
+    """
+    Static instructions first (prompt file, extra instructions, output format) as a
+    byte-stable prefix, then each (name, content) data section
+    """
+    instructions = [('prompt', prompt_content)]
+    instructions += list(extra_instructions)
+    instructions.append(('output_format', OUTPUT_FORMAT_INSTRUCTIONS))
+    template = PromptTemplate(instructions, trailer=OUTPUT_FORMAT_REMINDER)
+    return template.render(sections)
+
+
+def save_combined_prompt(combined_prompt, prefix="combined_prompt"):
+    """Save the prompt and its segment boundaries to the current directory (kept for debugging)"""
+    date_str = datetime.now().strftime('%Y%m%d_%H%M%S')
+    prompt_path = f"{prefix}_{date_str}.md"
+    combined_prompt.save(prompt_path)
+    prefix_bytes = len(combined_prompt.prefix.encode('utf-8'))
+    print(f"Static prompt prefix: {prefix_bytes} bytes, sha256 {combined_prompt.prefix_hash[:16]}")
+    return prompt_path
+
+
+def run_claude(prompt_path, env):
+    """Run claude -p once with the prompt file and return its stdout; raises CalledProcessError"""
+    # Use absolute path for crontab compatibility, shell=True for command substitution
+    claude_cmd_str = f'{CLAUDE_PATH} -p "$(cat {prompt_path})"'
+    print(f"Running command: {claude_cmd_str}")
+    result = subprocess.run(claude_cmd_str, shell=True, capture_output=True, text=True, check=True, env=env)
+    return result.stdout
+
+
+def build_claude_env():
+    """Set up environment for crontab compatibility"""
+    env = os.environ.copy()
+    env['PATH'] = f"/opt/homebrew/bin:{env.get('PATH', '')}"
+    env['ANTHROPIC_BASE_URL'] = 'https://gaccode.com/claudecode'
+    env['NODE_EXTRA_CA_CERTS'] = '/opt/homebrew/lib/node_modules/@anthropic-ai/claude-code/ca.pem'
+    return env
+
+
+def extract_marked_content(output):
+    """Return the stripped text between the start/end markers, or None if missing or empty"""
+    match = re.search(MARKER_PATTERN, output, re.DOTALL)
+    if not match:
+        return None
+    return match.group(1).strip() or None
+
+
+def load_latency_history(path=LATENCY_HISTORY_FILE):
+    """Load latencies (seconds) of previous successful claude runs"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            samples = json.load(f)
+        return [float(s) for s in samples]
+    except (OSError, ValueError, TypeError):
+        return []
+
+
+def save_latency_sample(elapsed, path=LATENCY_HISTORY_FILE):
+    """Append a successful run latency, keeping only the most recent samples"""
+    samples = load_latency_history(path)
+    samples.append(round(elapsed, 2))
+    samples = samples[-LATENCY_HISTORY_SIZE:]
+    # Parallel rolling updates share a history file; replace it atomically
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(samples, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: could not save latency history: {e}")
+
+
+def hedge_delay_from_history(percentile, default_delay, path=LATENCY_HISTORY_FILE):
+    """Latency percentile of past runs (nearest rank), or default_delay if history is too short"""
+    samples = sorted(load_latency_history(path))
+    if len(samples) < MIN_LATENCY_SAMPLES:
+        return default_delay
+    rank = max(1, int(round(percentile / 100.0 * len(samples))))
+    return samples[min(rank, len(samples)) - 1]
+
+
+class ClaudeAttempt:
+    """One claude -p run whose stdout is validated as it streams in"""
+
+    def __init__(self, number, prompt_path, env, results):
+        self.number = number
+        self.started = time.monotonic()
+        self.stderr = ""
+        self._results = results
+        cmd = f'{CLAUDE_PATH} -p "$(cat {prompt_path})"'
+        # New session so stop() can kill the shell together with claude
+        self.proc = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                     text=True, env=env, start_new_session=True)
+        threading.Thread(target=self._drain_stderr, daemon=True).start()
+        threading.Thread(target=self._watch_stdout, daemon=True).start()
+
+    def _drain_stderr(self):
+        self.stderr = self.proc.stderr.read()
+
+    def _watch_stdout(self):
+        chunks = []
+        msg = None
+        for line in iter(self.proc.stdout.readline, ''):
+            if msg:
+                # Already reported; keep draining so claude never blocks on a full pipe
+                continue
+            chunks.append(line)
+            # Validate as soon as a closing marker arrives instead of waiting for exit
+            if '<!-- end -->' in line:
+                msg = extract_marked_content(''.join(chunks))
+                if msg:
+                    self._results.put((self, msg, time.monotonic() - self.started))
+        self.proc.wait()
+        if not msg:
+            self._results.put((self, None, time.monotonic() - self.started))
+
+    def stop(self, grace=0.0):
+        """Give the process grace seconds to exit, then kill its process group and reap it"""
+        try:
+            self.proc.wait(timeout=grace)
+            return
+        except subprocess.TimeoutExpired:
+            pass
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            try:
+                os.killpg(self.proc.pid, sig)
+            except (ProcessLookupError, PermissionError):
+                pass
+            try:
+                self.proc.wait(timeout=5)
+                return
+            except subprocess.TimeoutExpired:
+                continue
+
+
+def run_claude_hedged(prompt_path, env, hedge_delay, max_attempts):
+    """
+    Run claude with hedged attempts.
+
+    A second attempt is launched in parallel once the running one exceeds
+    hedge_delay seconds; a failed attempt is replaced immediately. The first
+    attempt producing valid marked output wins and the others are cancelled.
+    Returns (msg, elapsed), elapsed measured end to end from the first launch,
+    or (None, None) if every attempt failed. Recording only the winner's own
+    runtime would keep dropping the slow tail and pull the hedge percentile down.
+    """
+    results = queue.Queue()
+    first_started = time.monotonic()
+    running = []
+    winner = None
+    launched = 0
+
+    def launch(reason):
+        nonlocal launched
+        launched += 1
+        print(f"Starting claude attempt {launched}/{max_attempts} ({reason})")
+        running.append(ClaudeAttempt(launched, prompt_path, env, results))
+
+    launch("initial")
+    try:
+        while running:
+            timeout = None
+            if len(running) == 1 and launched < max_attempts:
+                timeout = max(0.0, running[0].started + hedge_delay - time.monotonic())
+            try:
+                attempt, msg, elapsed = results.get(timeout=timeout)
+            except queue.Empty:
+                launch(f"hedge after {hedge_delay:.0f}s")
+                continue
+
+            running.remove(attempt)
+            if msg:
+                total = time.monotonic() - first_started
+                print(f"Attempt {attempt.number} produced valid output in {elapsed:.1f}s ({total:.1f}s end to end)")
+                winner = attempt
+                return msg, total
+
+            print(f"Attempt {attempt.number} failed after {elapsed:.1f}s "
+                  f"(exit code {attempt.proc.returncode}): no content between markers")
+            if attempt.stderr:
+                print(f"Command error: {attempt.stderr.strip()}")
+            if not running and launched < max_attempts:
+                launch("retry")
+        return None, None
+    finally:
+        for attempt in running:
+            print(f"Cancelling attempt {attempt.number}")
+            attempt.stop()
+        # The winner normally exits right after the end marker; don't leave it orphaned
+        if winner is not None:
+            winner.stop(grace=5)
+
+
 def main():
     parser = argparse.ArgumentParser(description='Analyze log files using Claude CLI')
     parser.add_argument('-p', '--prompt', default='prompt.md', 
@@ -17,8 +234,18 @@ def main():
     parser.add_argument('-o', '--output', 
                        help='Output filename (default: output_YYYYMMDD.md)')
     parser.add_argument('files', nargs='*', help='Additional log files')
+    parser.add_argument('--hedge', action='store_true',
+                       help='Launch a parallel claude attempt when the first one is slow; first valid output wins')
+    parser.add_argument('--max-attempts', type=int, default=3,
+                       help='Total claude attempts in hedge mode (default: 3)')
+    parser.add_argument('--hedge-percentile', type=float, default=90,
+                       help='Latency percentile of past runs that triggers the hedge (default: 90)')
+    parser.add_argument('--hedge-delay', type=float, default=180,
+                       help='Hedge delay in seconds until enough latency history exists (default: 180)')
+    add_profile_argument(parser)
     
     args = parser.parse_args()
+    enable_profiling(args.profile)
     
     # Combine input files from -i and positional arguments
     log_files = (args.log_files or []) + args.files
@@ -47,69 +274,52 @@ def main():
         sys.exit(1)
     
     try:
-        # Create combined prompt
-        combined_prompt = ""
-        
-        
-        # 1. Add user's prompt file content
-        with open(args.prompt, 'r', encoding='utf-8') as f:
-            prompt_content = f.read()
-        combined_prompt += prompt_content + "\n\n"
-        
-        # 2. Add all input log files content
-        for log_file in valid_files:
-            combined_prompt += f"=== {log_file} ===\n"
-            with open(log_file, 'r', encoding='utf-8') as f:
-                log_content = f.read()
-            combined_prompt += log_content + "\n\n"
-        
-        # 3. Add output format instructions
-        combined_prompt += """请按照以下格式输出结果：
-<!-- start -->
-[你的分析结果在这里]
-<!-- end -->
-
-"""
-    
-        # Save combined prompt to current directory
-        date_str = datetime.now().strftime('%Y%m%d_%H%M%S')
-        temp_prompt_path = f"combined_prompt_{date_str}.md"
+        # Static prompt file and output format instructions first, then all input log files
+        with stage('read_inputs'):
+            with open(args.prompt, 'r', encoding='utf-8') as f:
+                prompt_content = f.read()
+            
+            sections = []
+            for log_file in valid_files:
+                with open(log_file, 'r', encoding='utf-8') as f:
+                    sections.append((log_file, f.read()))
         
-        with open(temp_prompt_path, 'w', encoding='utf-8') as f:
-            f.write(combined_prompt)
+        with stage('build_prompt'):
+            combined_prompt = build_combined_prompt(prompt_content, sections)
+            
+            # Save combined prompt to current directory
+            temp_prompt_path = save_combined_prompt(combined_prompt)
         
         print(f"Combined prompt saved to: {temp_prompt_path}")
         
-        # Build claude command with -p flag and cat
-        # Use absolute path for crontab compatibility
-        claude_path = "/opt/homebrew/bin/claude"
-        claude_cmd_str = f'{claude_path} -p "$(cat {temp_prompt_path})"'
-        
-        print(f"Running command: {claude_cmd_str}")
+        env = build_claude_env()
         
-        # Set up environment for crontab compatibility
-        env = os.environ.copy()
-        env['PATH'] = f"/opt/homebrew/bin:{env.get('PATH', '')}"
-        env['ANTHROPIC_BASE_URL'] = 'https://gaccode.com/claudecode'
-        env['NODE_EXTRA_CA_CERTS'] = '/opt/homebrew/lib/node_modules/@anthropic-ai/claude-code/ca.pem'
-        
-        # Execute claude command using shell=True for command substitution
-        result = subprocess.run(claude_cmd_str, shell=True, capture_output=True, text=True, check=True, env=env)
-        output = result.stdout
-        
-        # Extract content between <!-- start --> and <!-- end -->
-        pattern = r'<!-- start -->(.*?)<!-- end -->'
-        match = re.search(pattern, output, re.DOTALL)
-        
-        if match:
-            msg = match.group(1).strip()
-            # Check if extracted content is empty
-            if not msg:
-                print("Error: Extracted content between markers is empty")
+        if args.hedge:
+            hedge_delay = hedge_delay_from_history(args.hedge_percentile, args.hedge_delay)
+            print(f"Hedge mode: up to {args.max_attempts} attempts, hedge delay {hedge_delay:.0f}s")
+            with stage('claude'):
+                msg, elapsed = run_claude_hedged(temp_prompt_path, env, hedge_delay, args.max_attempts)
+            if msg is None:
+                print(f"Error: All {args.max_attempts} claude attempts failed to produce valid output")
                 sys.exit(1)
+            save_latency_sample(elapsed)
         else:
-            print("Error: No content found between <!-- start --> and <!-- end --> markers")
-            sys.exit(1)
+            with stage('claude'):
+                output = run_claude(temp_prompt_path, env)
+            
+            # Extract content between <!-- start --> and <!-- end -->
+            with stage('extract'):
+                match = re.search(MARKER_PATTERN, output, re.DOTALL)
+            
+            if match:
+                msg = match.group(1).strip()
+                # Check if extracted content is empty
+                if not msg:
+                    print("Error: Extracted content between markers is empty")
+                    sys.exit(1)
+            else:
+                print("Error: No content found between <!-- start --> and <!-- end --> markers")
+                sys.exit(1)
         
         # Generate output filename
         if args.output:
@@ -119,8 +329,9 @@ def main():
             output_file = f"output_{date_str}.md"
         
         # Write extracted message to output file
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(msg)
+        with stage('write_output'):
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(msg)
         
         # Verify the output file was written and is not empty
         if not os.path.exists(output_file):
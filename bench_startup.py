@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动耗时基准测试
+对 claude_wechat 的每个子命令模块，测量新进程中导入该模块的耗时（含解释器启动），
+并通过 -X importtime 列出最慢的导入
+
+Usage: python bench_startup.py [-n 10] [--budget-ms 100] [子命令...]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from claude_wechat import COMMANDS
+
+
+def measure_wall_ms(module: str, runs: int) -> float:
+    """新进程中 import 模块的墙钟耗时中位数（毫秒）"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', f'import claude_wechat, {module}'], check=True,
+                       cwd=os.path.dirname(os.path.abspath(__file__)))
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def top_imports(module: str, limit: int) -> list:
+    """-X importtime 输出中累计耗时最高的导入 [(微秒, 模块名)]"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    rows = []
+    for line in result.stderr.splitlines():
+        # 格式: "import time: self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        rows.append((int(parts[1].strip()), parts[2].strip()))
+    rows.sort(reverse=True)
+    return rows[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='测量各子命令的启动导入耗时')
+    parser.add_argument('commands', nargs='*', help='要测量的子命令 (默认: 全部)')
+    parser.add_argument('-n', '--runs', type=int, default=10, help='每个子命令的运行次数 (默认: 10)')
+    parser.add_argument('--budget-ms', type=float, default=100, help='启动耗时预算，超出时返回非零 (默认: 100)')
+    parser.add_argument('--top', type=int, default=5, help='列出最慢的导入数量 (默认: 5)')
+    args = parser.parse_args()
+
+    commands = args.commands or list(COMMANDS)
+    unknown = [c for c in commands if c not in COMMANDS]
+    if unknown:
+        print(f"错误: 未知子命令 {', '.join(unknown)}")
+        sys.exit(2)
+
+    baseline = measure_wall_ms('sys', args.runs)
+    print(f"解释器启动基线: {baseline:.1f} ms")
+    print(f"{'子命令':<10}{'模块':<20}{'启动(ms)':>10}{'导入(ms)':>10}")
+
+    over_budget = []
+    for command in commands:
+        module = COMMANDS[command][0]
+        try:
+            wall = measure_wall_ms(module, args.runs)
+        except subprocess.CalledProcessError:
+            print(f"{command:<10}{module:<20}{'导入失败':>10}")
+            continue
+        print(f"{command:<10}{module:<20}{wall:>10.1f}{wall - baseline:>10.1f}")
+        for cumulative_us, name in top_imports(module, args.top):
+            print(f"{'':<14}{cumulative_us / 1000:>8.1f} ms  {name}")
+        if wall > args.budget_ms:
+            over_budget.append(command)
+
+    if over_budget:
+        print(f"超出 {args.budget_ms:.0f} ms 预算: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+聊天记录压缩列式归档
+每个群每月一个归档文件，消息按块列式存储（时间戳、发送者ID、昵称、内容各自压缩），
+文件末尾的块索引记录每块的时间范围，按时间范围读取时通过 mmap 读索引，只解压相关的块。
+
+文件格式:
+    MAGIC (8字节)
+    块 * N:    列长度头 '<IIII' + 时间戳列 + 发送者列 + 昵称列 + 内容列 (均为zlib压缩)
+    索引 * N:  '<qqQII' (最小时间戳, 最大时间戳, 块偏移, 块长度, 消息数)
+    尾部:      '<QI8s' (索引偏移, 块数量, MAGIC)
+
+追加时新块、新索引和新尾部都写在旧尾部之后，已有字节从不改写：进程中途被杀时文件末尾
+是不完整的数据，读取时向前找到最后一个有效尾部，下次追加时截掉这部分。
+旧索引留在文件中成为少量无用字节（每块 32 字节）。
+
+Usage:
+    python chatlog_archive.py import -d archive -wid 27587714869@chatroom 27587714869_chatroom_chatlog_20251107.md
+    python chatlog_archive.py render -d archive -wid 27587714869@chatroom -s "2025-11-06 00:00" -e "2025-11-07 12:00"
+"""
+
+import argparse
+import fcntl
+import mmap
+import os
+import re
+import struct
+import sys
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from chatlog_filter import HEADER_PATTERN
+from profiling import add_profile_argument, enable as enable_profiling, stage
+
+
+MAGIC = b'CWARC001'
+BLOCK_HEADER = struct.Struct('<IIII')
+INDEX_ENTRY = struct.Struct('<qqQII')
+FOOTER = struct.Struct('<QI8s')
+BLOCK_MESSAGES = 512
+COMPRESS_LEVEL = 9
+
+# getrecentchatlogs.py 输出的头部中的查询时间范围
+RANGE_PATTERN = re.compile(r'\*\*查询时间范围\*\*:\s*(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})')
+
+
+class Message(NamedTuple):
+    ts: int
+    sender: str
+    name: str
+    content: str
+
+
+class BlockIndex(NamedTuple):
+    min_ts: int
+    max_ts: int
+    offset: int
+    length: int
+    count: int
+
+
+def parse_chatlog(chatlog_data: str, base_time: datetime) -> List[Message]:
+    """
+    解析 chatlog 服务返回的文本为消息列表
+
+    消息头不带日期时，从 base_time 的日期开始推断，时间回退时视为跨天。
+    """
+    messages = []
+    current_date = base_time.date()
+    last_time = None
+    header = None
+    body: List[str] = []
+
+    def flush():
+        content = '\n'.join(body).strip('\n')
+        messages.append(Message(header[0], header[1], header[2], content))
+
+    for line in chatlog_data.splitlines():
+        match = HEADER_PATTERN.match(line)
+        if not match:
+            if header is not None:
+                body.append(line)
+            continue
+        if header is not None:
+            flush()
+        clock = datetime.strptime(match.group('time'), '%H:%M:%S').time()
+        if match.group('date'):
+            current_date = datetime.strptime(match.group('date'), '%Y-%m-%d').date()
+        elif last_time is not None and clock < last_time:
+            current_date += timedelta(days=1)
+        last_time = clock
+        ts = int(datetime.combine(current_date, clock).timestamp())
+        header = (ts, match.group('id'), match.group('name'))
+        body = []
+    if header is not None:
+        flush()
+    return messages
+
+
+def render_markdown(messages: Iterable[Message]) -> str:
+    """将消息渲染回 chatlog 服务的文本格式"""
+    parts = []
+    for msg in messages:
+        time_str = datetime.fromtimestamp(msg.ts).strftime('%Y-%m-%d %H:%M:%S')
+        parts.append(f"{msg.name}({msg.sender}) {time_str}\n{msg.content}\n")
+    return '\n'.join(parts)
+
+
+def _pack_strings(values: List[str]) -> bytes:
+    encoded = [v.encode('utf-8') for v in values]
+    lengths = struct.pack(f'<{len(encoded)}I', *(len(e) for e in encoded))
+    return zlib.compress(lengths + b''.join(encoded), COMPRESS_LEVEL)
+
+
+def _unpack_strings(data: bytes, count: int) -> List[str]:
+    raw = zlib.decompress(data)
+    lengths = struct.unpack_from(f'<{count}I', raw)
+    pos = 4 * count
+    values = []
+    for length in lengths:
+        values.append(raw[pos:pos + length].decode('utf-8'))
+        pos += length
+    return values
+
+
+def _encode_block(messages: List[Message]) -> bytes:
+    """列式编码一个块，时间戳按差值存储以提高压缩率"""
+    ts = [m.ts for m in messages]
+    deltas = [ts[0]] + [b - a for a, b in zip(ts, ts[1:])]
+    columns = [
+        zlib.compress(struct.pack(f'<{len(deltas)}q', *deltas), COMPRESS_LEVEL),
+        _pack_strings([m.sender for m in messages]),
+        _pack_strings([m.name for m in messages]),
+        _pack_strings([m.content for m in messages]),
+    ]
+    return BLOCK_HEADER.pack(*(len(c) for c in columns)) + b''.join(columns)
+
+
+def _decode_block(data, count: int) -> List[Message]:
+    lengths = BLOCK_HEADER.unpack_from(data, 0)
+    pos = BLOCK_HEADER.size
+    columns = []
+    for length in lengths:
+        columns.append(bytes(data[pos:pos + length]))
+        pos += length
+    deltas = struct.unpack(f'<{count}q', zlib.decompress(columns[0]))
+    ts = []
+    total = 0
+    for delta in deltas:
+        total += delta
+        ts.append(total)
+    senders = _unpack_strings(columns[1], count)
+    names = _unpack_strings(columns[2], count)
+    contents = _unpack_strings(columns[3], count)
+    return [Message(*row) for row in zip(ts, senders, names, contents)]
+
+
+class ArchiveReader:
+    """通过 mmap 读取归档文件，只解压与查询时间范围重叠的块"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        if len(self._map) < len(MAGIC) + FOOTER.size or self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"不是有效的归档文件: {path}")
+        try:
+            self.index_offset, block_count, self.data_end = self._locate_footer()
+        except ValueError:
+            self.close()
+            raise
+        self.blocks = [BlockIndex(*INDEX_ENTRY.unpack_from(self._map, self.index_offset + i * INDEX_ENTRY.size))
+                       for i in range(block_count)]
+
+    def _locate_footer(self) -> Tuple[int, int, int]:
+        """
+        返回 (索引偏移, 块数量, 有效数据结尾)
+
+        正常情况下尾部就在文件末尾；追加中途中断时末尾是不完整的数据，向前查找最后一个
+        索引紧接在它之前的尾部，即上一次完整追加的结果。
+        """
+        end = len(self._map)
+        while end >= len(MAGIC) + FOOTER.size:
+            pos = end - FOOTER.size
+            index_offset, block_count, magic = FOOTER.unpack_from(self._map, pos)
+            if magic == MAGIC and index_offset + block_count * INDEX_ENTRY.size == pos:
+                return index_offset, block_count, end
+            found = self._map.rfind(MAGIC, len(MAGIC), end - 1)
+            if found < 0:
+                break
+            end = found + len(MAGIC)
+        raise ValueError(f"归档文件尾部损坏: {self.path}")
+
+    def __enter__(self) -> 'ArchiveReader':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    def read_block(self, block: BlockIndex) -> List[Message]:
+        view = memoryview(self._map)[block.offset:block.offset + block.length]
+        try:
+            return _decode_block(view, block.count)
+        finally:
+            view.release()
+
+    def read_range(self, start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> Iterator[Message]:
+        """按时间顺序返回 [start_ts, end_ts] 内的消息"""
+        for block in self.blocks:
+            if start_ts is not None and block.max_ts < start_ts:
+                continue
+            if end_ts is not None and block.min_ts > end_ts:
+                continue
+            for msg in self.read_block(block):
+                if (start_ts is None or msg.ts >= start_ts) and (end_ts is None or msg.ts <= end_ts):
+                    yield msg
+
+
+def _write_empty(path: str) -> None:
+    with open(path, 'wb') as f:
+        f.write(MAGIC + FOOTER.pack(len(MAGIC), 0, MAGIC))
+
+
+def _lock(path: str):
+    """归档文件的排他锁（旁路 .lock 文件）；定时更新和发送脚本可能同时追加同一个群"""
+    lock = open(f"{path}.lock", 'w')
+    fcntl.flock(lock, fcntl.LOCK_EX)
+    return lock
+
+
+def append_to_file(path: str, messages: List[Message]) -> int:
+    """
+    追加消息到单个归档文件，返回实际新增的消息数
+
+    与已归档消息重叠的部分（相邻两天的抓取窗口会重叠）通过只解压尾部相关块去重。
+    去重按条数抵消：同一秒同一发送者的相同内容可能是真实的多条消息，批内重复保留。
+    从读取尾部到 fsync 全程持有锁，并发追加不会基于同一个旧尾部互相覆盖。
+    """
+    if not messages:
+        return 0
+
+    with _lock(path):
+        if not os.path.exists(path):
+            _write_empty(path)
+
+        new_min = min(m.ts for m in messages)
+        with ArchiveReader(path) as reader:
+            blocks = list(reader.blocks)
+            data_end = reader.data_end
+            seen = Counter()
+            for block in blocks:
+                if block.max_ts >= new_min:
+                    seen.update(reader.read_block(block))
+
+        fresh = []
+        for msg in sorted(messages):
+            if seen[msg] > 0:
+                seen[msg] -= 1
+            else:
+                fresh.append(msg)
+        if not fresh:
+            return 0
+
+        with open(path, 'r+b') as f:
+            # 写在旧尾部之后（截掉上次中断留下的不完整数据），新尾部写完之前旧尾部一直有效
+            f.seek(data_end)
+            offset = data_end
+            for i in range(0, len(fresh), BLOCK_MESSAGES):
+                chunk = fresh[i:i + BLOCK_MESSAGES]
+                data = _encode_block(chunk)
+                f.write(data)
+                blocks.append(BlockIndex(chunk[0].ts, chunk[-1].ts, offset, len(data), len(chunk)))
+                offset += len(data)
+            f.write(b''.join(INDEX_ENTRY.pack(*b) for b in blocks))
+            f.write(FOOTER.pack(offset, len(blocks), MAGIC))
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+        return len(fresh)
+
+
+def clean_wechat_id(wechat_id: str) -> str:
+    return wechat_id.replace('@', '_').replace(':', '_')
+
+
+def archive_path(archive_dir: str, wechat_id: str, month: datetime) -> str:
+    """归档文件名: wechatid_chatlog_YYYYMM.cwa"""
+    return os.path.join(archive_dir, f"{clean_wechat_id(wechat_id)}_chatlog_{month.strftime('%Y%m')}.cwa")
+
+
+def _months(start: datetime, end: datetime) -> Iterator[datetime]:
+    month = start.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    while month <= end:
+        yield month
+        month = (month + timedelta(days=32)).replace(day=1)
+
+
+def append_messages(archive_dir: str, wechat_id: str, messages: List[Message]) -> int:
+    """按月份拆分消息并追加到对应的归档文件"""
+    os.makedirs(archive_dir, exist_ok=True)
+    by_month = {}
+    for msg in messages:
+        key = datetime.fromtimestamp(msg.ts).strftime('%Y%m')
+        by_month.setdefault(key, []).append(msg)
+    added = 0
+    for key, month_messages in sorted(by_month.items()):
+        path = archive_path(archive_dir, wechat_id, datetime.strptime(key, '%Y%m'))
+        added += append_to_file(path, month_messages)
+    return added
+
+
+def latest_timestamp(archive_dir: str, wechat_id: str) -> Optional[int]:
+    """返回该群归档中最新消息的时间戳，没有归档时返回 None"""
+    prefix = f"{clean_wechat_id(wechat_id)}_chatlog_"
+    if not os.path.isdir(archive_dir):
+        return None
+    names = sorted((n for n in os.listdir(archive_dir) if n.startswith(prefix) and n.endswith('.cwa')),
+                   reverse=True)
+    for name in names:
+        with ArchiveReader(os.path.join(archive_dir, name)) as reader:
+            if reader.blocks:
+                return max(block.max_ts for block in reader.blocks)
+    return None
+
+
+def read_messages(archive_dir: str, wechat_id: str, start: datetime, end: datetime) -> List[Message]:
+    """读取时间范围内的消息，只打开涉及的月份文件"""
+    start_ts, end_ts = int(start.timestamp()), int(end.timestamp())
+    messages = []
+    for month in _months(start, end):
+        path = archive_path(archive_dir, wechat_id, month)
+        if not os.path.exists(path):
+            continue
+        with ArchiveReader(path) as reader:
+            messages.extend(reader.read_range(start_ts, end_ts))
+    messages.sort()
+    return messages
+
+
+def _split_markdown(content: str) -> Tuple[Optional[datetime], str]:
+    """拆分 getrecentchatlogs.py 输出的头部和聊天记录正文"""
+    match = RANGE_PATTERN.search(content)
+    start = datetime.strptime(match.group(1), '%Y-%m-%d %H:%M:%S') if match else None
+    marker = '## 聊天记录\n'
+    body = content.split(marker, 1)[1] if marker in content else content
+    return start, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description='聊天记录压缩列式归档')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = sub.add_parser('import', help='导入已有的 markdown 聊天记录文件')
+    import_parser.add_argument('-d', '--archive-dir', required=True, help='归档目录')
+    import_parser.add_argument('-wid', '--wechat-id', required=True, help='微信群聊ID')
+    import_parser.add_argument('files', nargs='+', help='markdown 聊天记录文件')
+
+    render_parser = sub.add_parser('render', help='按时间范围渲染聊天记录')
+    render_parser.add_argument('-d', '--archive-dir', required=True, help='归档目录')
+    render_parser.add_argument('-wid', '--wechat-id', required=True, help='微信群聊ID')
+    render_parser.add_argument('-s', '--start', required=True, help='开始时间 (YYYY-MM-DD HH:MM)')
+    render_parser.add_argument('-e', '--end', required=True, help='结束时间 (YYYY-MM-DD HH:MM)')
+    render_parser.add_argument('-o', '--output', help='输出文件 (默认: 标准输出)')
+    for sub_parser in (import_parser, render_parser):
+        add_profile_argument(sub_parser)
+
+    args = parser.parse_args()
+    enable_profiling(args.profile)
+
+    if args.command == 'import':
+        total = 0
+        for path in args.files:
+            with stage('parse'):
+                with open(path, 'r', encoding='utf-8') as f:
+                    start, body = _split_markdown(f.read())
+                if start is None:
+                    start = datetime.fromtimestamp(os.path.getmtime(path))
+                messages = parse_chatlog(body, start)
+            with stage('append'):
+                added = append_messages(args.archive_dir, args.wechat_id, messages)
+            total += added
+            print(f"{path}: 解析 {len(messages)} 条，新增 {added} 条")
+        print(f"导入完成，共新增 {total} 条消息")
+        return
+
+    try:
+        start = datetime.strptime(args.start, '%Y-%m-%d %H:%M')
+        end = datetime.strptime(args.end, '%Y-%m-%d %H:%M')
+    except ValueError as e:
+        print(f"错误: 时间格式无效 - {e}")
+        sys.exit(1)
+    with stage('read'):
+        messages = read_messages(args.archive_dir, args.wechat_id, start, end)
+    with stage('render'):
+        text = render_markdown(messages)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+聊天记录多规则过滤引擎
+将规则文件中的发送者、关键词、正则和消息类型编译为一个匹配器，单次流式扫描完成过滤
+
+规则文件格式 (YAML):
+    senders:            # 发送者微信ID或昵称，整条消息跳过
+      - bushcraftsecret
+    keywords:           # 内容包含任一关键词则跳过（Aho-Corasick 一次扫描）
+      - 加群领资料
+    regexes:            # 内容匹配任一正则则跳过（无捕获组、无全局内联标志的合并为一个正则）
+      - 'https?://t\\.cn/\\S+'
+    types:              # 消息类型标记，内容以该标记开头则跳过
+      - '[表情]'
+
+Usage: python chatlog_filter.py -r filter_rules.yml -i chatlog.md -o filtered.md
+"""
+
+import argparse
+import io
+import re
+import sys
+from collections import Counter, deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from profiling import add_profile_argument, enable as enable_profiling, stage
+
+
+# chatlog 服务的消息头格式: "昵称(wxid_xxx) 2025-07-15 22:31:05" 或 "昵称(wxid_xxx) 22:31:05"
+HEADER_PATTERN = re.compile(
+    r'^(?P<name>.*?)\((?P<id>[^()\s]+)\)\s+(?:(?P<date>\d{4}-\d{2}-\d{2})\s+)?(?P<time>\d{2}:\d{2}:\d{2})\s*$'
+)
+
+RULE_KINDS = ('senders', 'keywords', 'regexes', 'types')
+
+
+class AhoCorasick:
+    """多模式字符串匹配自动机，一次扫描文本即可找到任一模式"""
+
+    def __init__(self, patterns: Iterable[Tuple[str, str]]):
+        # patterns: (模式串, 规则标签)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Optional[str]] = [None]
+        for pattern, label in patterns:
+            if pattern:
+                self._add(pattern, label)
+        self._build()
+
+    def _add(self, pattern: str, label: str) -> None:
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+            state = nxt
+        if self._output[state] is None:
+            self._output[state] = label
+
+    def _build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                # 继承失败链上的输出，保证较短模式在较长模式内部也能命中
+                if self._output[nxt] is None:
+                    self._output[nxt] = self._output[self._fail[nxt]]
+
+    def __bool__(self) -> bool:
+        return len(self._goto) > 1
+
+    def search(self, text: str) -> Optional[str]:
+        """返回第一个命中的规则标签，未命中返回 None"""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state] is not None:
+                return output[state]
+        return None
+
+
+class ChatlogFilter:
+    """编译后的过滤规则集，记录每条规则的命中次数"""
+
+    def __init__(self, senders: Iterable[str] = (), keywords: Iterable[str] = (),
+                 regexes: Iterable[str] = (), types: Iterable[str] = ()):
+        self.senders = {s for s in senders if s}
+        self.types = tuple(t for t in types if t)
+        self.hits: Counter = Counter()
+
+        keyword_list = [k for k in keywords if k]
+        self._content_matcher = AhoCorasick((k, f"keyword:{k}") for k in keyword_list)
+        # 无法识别消息头的行退化为整行匹配，发送者也作为字面量参与（兼容旧的 --nouser 行为）
+        self._line_matcher = AhoCorasick(
+            [(s, f"sender:{s}") for s in sorted(self.senders)] +
+            [(k, f"keyword:{k}") for k in keyword_list]
+        )
+
+        self._regex_labels: Dict[str, str] = {}
+        self._separate_regexes: List[Tuple[re.Pattern, str]] = []
+        default_flags = re.compile('').flags
+        parts = []
+        for i, pattern in enumerate(r for r in regexes if r):
+            compiled = re.compile(pattern)  # 提前暴露无效正则
+            # 带捕获组（合并后反向引用编号错位、组名可能冲突）或 (?i) 之类全局内联标志的正则不能安全合并，单独匹配
+            if compiled.groups or compiled.flags != default_flags:
+                self._separate_regexes.append((compiled, f"regex:{pattern}"))
+                continue
+            group = f"r{i}"
+            self._regex_labels[group] = f"regex:{pattern}"
+            parts.append(f"(?P<{group}>{pattern})")
+        self._regex = re.compile('|'.join(parts)) if parts else None
+
+    @classmethod
+    def from_file(cls, path: str, extra_senders: Iterable[str] = ()) -> 'ChatlogFilter':
+        """从 YAML 规则文件构建过滤器"""
+        import yaml
+
+        with open(path, 'r', encoding='utf-8') as f:
+            rules = yaml.safe_load(f) or {}
+        if not isinstance(rules, dict):
+            raise ValueError(f"规则文件 {path} 格式错误: 顶层必须是映射")
+        unknown = set(rules) - set(RULE_KINDS)
+        if unknown:
+            raise ValueError(f"规则文件 {path} 包含未知规则类型: {', '.join(sorted(unknown))}")
+        return cls(
+            senders=[str(s) for s in (rules.get('senders') or [])] + list(extra_senders),
+            keywords=[str(k) for k in (rules.get('keywords') or [])],
+            regexes=[str(r) for r in (rules.get('regexes') or [])],
+            types=[str(t) for t in (rules.get('types') or [])],
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.senders or self.types or self._line_matcher or self._regex or self._separate_regexes)
+
+    def _search_regexes(self, text: str) -> Optional[str]:
+        if self._regex:
+            match = self._regex.search(text)
+            if match:
+                return self._regex_labels[match.lastgroup]
+        for compiled, label in self._separate_regexes:
+            if compiled.search(text):
+                return label
+        return None
+
+    def _match_content(self, content: str) -> Optional[str]:
+        if self.types:
+            stripped = content.lstrip()
+            for t in self.types:
+                if stripped.startswith(t):
+                    return f"type:{t}"
+        label = self._content_matcher.search(content) if self._content_matcher else None
+        if label:
+            return label
+        return self._search_regexes(content)
+
+    def _match_message(self, header: re.Match, content: str) -> Optional[str]:
+        for key in (header.group('id'), header.group('name')):
+            if key in self.senders:
+                return f"sender:{key}"
+        return self._match_content(content)
+
+    def _match_line(self, line: str) -> Optional[str]:
+        label = self._line_matcher.search(line) if self._line_matcher else None
+        if label:
+            return label
+        return self._search_regexes(line)
+
+    def filter_lines(self, lines: Iterable[str]) -> Iterator[str]:
+        """
+        单次流式过滤
+
+        消息以消息头行开始，直到下一个消息头为止；命中规则的整条消息被跳过。
+        第一个消息头之前的行逐行匹配。
+        """
+        header = None
+        block: List[str] = []
+
+        def flush() -> Iterator[str]:
+            label = self._match_message(header, ''.join(block[1:]))
+            if label:
+                self.hits[label] += 1
+            else:
+                yield from block
+
+        for line in lines:
+            match = HEADER_PATTERN.match(line.rstrip('\r\n'))
+            if match:
+                if header is not None:
+                    yield from flush()
+                header, block = match, [line]
+            elif header is not None:
+                block.append(line)
+            else:
+                label = self._match_line(line)
+                if label:
+                    self.hits[label] += 1
+                else:
+                    yield line
+        if header is not None:
+            yield from flush()
+
+    def filter_text(self, text: str) -> str:
+        return ''.join(self.filter_lines(io.StringIO(text)))
+
+    def report(self) -> str:
+        """每条规则的命中次数报告"""
+        if not self.hits:
+            return "过滤规则命中: 无"
+        lines = [f"过滤规则命中 (共 {sum(self.hits.values())} 条):"]
+        for label, count in self.hits.most_common():
+            lines.append(f"  {label}: {count}")
+        return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='使用规则文件过滤聊天记录')
+    parser.add_argument('-r', '--rules', required=True, help='规则文件路径 (YAML)')
+    parser.add_argument('-i', '--input', required=True, help='输入聊天记录文件')
+    parser.add_argument('-o', '--output', help='输出文件 (默认: 标准输出)')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    enable_profiling(args.profile)
+
+    try:
+        with stage('load_rules'):
+            engine = ChatlogFilter.from_file(args.rules)
+    except (OSError, ValueError, re.error) as e:
+        print(f"错误: 加载规则文件失败 - {e}", file=sys.stderr)
+        sys.exit(1)
+
+    with stage('filter'), open(args.input, 'r', encoding='utf-8') as src:
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as dst:
+                dst.writelines(engine.filter_lines(src))
+        else:
+            sys.stdout.writelines(engine.filter_lines(src))
+
+    print(engine.report(), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+claude_wechat 统一命令行入口
+子命令按需导入对应脚本模块，不加载其他子命令的依赖，保证单次发送/查询的快速启动
+
+Usage: python claude_wechat.py [--profile [DIR]] [--record DIR | --replay DIR [--replay-speed X]] <子命令> [参数...]
+示例:
+  python claude_wechat.py fetch -wid 27587714869@chatroom -o chat.md -t 24
+  python claude_wechat.py query "AI软工"
+  python claude_wechat.py post -i message.txt -wid 56984901177@chatroom
+  python claude_wechat.py --replay cassettes/20251107 --replay-speed 0 fetch -wid 27587714869@chatroom
+  python claude_wechat.py --profile analyze -p ai_prompt.md -i chat.md
+"""
+
+import sys
+
+# 子命令: (模块名, main 是否为协程, 说明)
+COMMANDS = {
+    'fetch': ('getrecentchatlogs', True, '获取微信群聊近期聊天记录'),
+    'query': ('querywechatid', True, '根据群名称查询微信群ID'),
+    'analyze': ('analyze_logs', False, '使用Claude CLI分析聊天记录'),
+    'html': ('gen_html', False, '使用Claude CLI将markdown转换为HTML'),
+    'post': ('post_wechat', False, '发送纯文本消息到微信群'),
+    'filter': ('chatlog_filter', False, '使用规则文件过滤聊天记录'),
+    'archive': ('chatlog_archive', False, '聊天记录压缩列式归档'),
+    'rolling': ('rolling_summary', False, '增量滚动摘要'),
+    'podcast': ('podcast_tts', False, '并行合成播客音频'),
+}
+
+
+def print_usage(stream=sys.stdout) -> None:
+    stream.write("用法: python claude_wechat.py [全局参数] <子命令> [参数...]\n\n子命令:\n")
+    for name, (module, _, description) in COMMANDS.items():
+        stream.write(f"  {name:<10}{description} ({module}.py)\n")
+    stream.write("\n全局参数:\n"
+                 "  --record DIR        录制所有 chatlog/webot HTTP 请求和响应到 DIR\n"
+                 "  --replay DIR        从 DIR 回放录制的响应，不访问网络\n"
+                 "  --replay-speed X    回放速度倍数，0 表示不等待 (默认: 1)\n"
+                 "  --profile [DIR]     按阶段剖析性能，火焰图和报告写入 DIR (默认: profiles)\n")
+    stream.write("\n使用 python claude_wechat.py <子命令> -h 查看子命令参数\n")
+
+
+def parse_global_options(argv: list) -> list:
+    """解析子命令前的全局参数，写入环境变量以便子进程同样生效，返回剩余参数"""
+    import os
+    from http_cassette import RECORD_ENV, REPLAY_ENV, SPEED_ENV
+    from profiling import DEFAULT_PROFILE_DIR, PROFILE_ENV
+
+    options = {'--record': RECORD_ENV, '--replay': REPLAY_ENV, '--replay-speed': SPEED_ENV}
+    while argv and argv[0] in (*options, '--profile'):
+        if argv[0] == '--profile':
+            # 目录可省略：后面紧跟子命令或其他全局参数时使用默认目录
+            has_dir = len(argv) > 1 and argv[1] not in COMMANDS and not argv[1].startswith('-')
+            os.environ[PROFILE_ENV] = argv[1] if has_dir else DEFAULT_PROFILE_DIR
+            argv = argv[2:] if has_dir else argv[1:]
+            continue
+        if len(argv) < 2:
+            sys.stderr.write(f"错误: {argv[0]} 需要参数\n")
+            sys.exit(2)
+        os.environ[options[argv[0]]] = argv[1]
+        argv = argv[2:]
+    if os.environ.get(RECORD_ENV) and os.environ.get(REPLAY_ENV):
+        sys.stderr.write("错误: --record 和 --replay 不能同时使用\n")
+        sys.exit(2)
+    return argv
+
+
+def main() -> None:
+    argv = parse_global_options(sys.argv[1:])
+    if not argv or argv[0] in ('-h', '--help'):
+        print_usage()
+        sys.exit(0)
+
+    command = argv[0]
+    if command not in COMMANDS:
+        sys.stderr.write(f"错误: 未知子命令 {command}\n\n")
+        print_usage(sys.stderr)
+        sys.exit(2)
+
+    module_name, is_async, _ = COMMANDS[command]
+    # 子命令脚本自己解析 sys.argv，去掉子命令名后原样传入
+    sys.argv = [f"claude_wechat {command}"] + argv[1:]
+
+    import importlib
+    module = importlib.import_module(module_name)
+    if is_async:
+        import asyncio
+        asyncio.run(module.main())
+    else:
+        module.main()
+
+
+if __name__ == '__main__':
+    main()
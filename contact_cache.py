@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+联系人与群成员显示名缓存
+从 chatlog 服务批量获取联系人和群成员显示名并按 TTL 缓存到本地，
+把聊天记录中的发送者改写为短而稳定的别名（U1、U2…），每个群只输出一个对照表，
+减少 prompt 中重复的 wxid 和长昵称，摘要中也能引用可读的名字。
+改写后的消息头为 "U3(U3) 时间"，仍符合 chatlog_filter.HEADER_PATTERN，归档导入和过滤照常可用。
+"""
+
+import fcntl
+import json
+import os
+import time
+from typing import Dict, List
+
+from chatlog_filter import HEADER_PATTERN
+from http_cassette import aiohttp_get_text
+
+DEFAULT_CACHE_FILE = 'contact_cache.json'
+DEFAULT_TTL_HOURS = 24
+
+
+def _parse_csv_names(data: str, id_col: int, name_cols: List[int]) -> Dict[str, str]:
+    """解析 chatlog 服务的 CSV 列表（首行为表头），取第一个非空的名字列"""
+    names = {}
+    lines = data.strip().split('\n')
+    for line in lines[1:]:
+        parts = line.split(',')
+        if len(parts) <= id_col or not parts[id_col]:
+            continue
+        for col in name_cols:
+            if col < len(parts) and parts[col].strip():
+                names[parts[id_col]] = parts[col].strip()
+                break
+    return names
+
+
+def _parse_members(data: str) -> Dict[str, str]:
+    """解析群详情 JSON 中的成员列表，兼容不同的字段名"""
+    try:
+        payload = json.loads(data)
+    except ValueError:
+        return {}
+    rooms = payload if isinstance(payload, list) else payload.get('items') or [payload]
+    members = {}
+    for room in rooms:
+        if not isinstance(room, dict):
+            continue
+        for user in room.get('users') or room.get('Users') or []:
+            user_id = user.get('userName') or user.get('UserName')
+            name = user.get('displayName') or user.get('DisplayName')
+            if user_id and name:
+                members[user_id] = name
+    return members
+
+
+class ContactCache:
+    def __init__(self, path: str = DEFAULT_CACHE_FILE, ttl_hours: float = DEFAULT_TTL_HOURS):
+        self.path = path
+        self.ttl = ttl_hours * 3600
+        self.data = self._empty()
+        self.data.update(self._load())
+        self._refreshed_contacts = False
+        self._touched_groups = set()
+
+    @staticmethod
+    def _empty() -> dict:
+        return {'contacts': {}, 'contacts_fetched_at': 0, 'chatrooms': {}, 'aliases': {}}
+
+    def _load(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"警告: 读取联系人缓存失败，将重新获取 - {e}")
+            return {}
+
+    def _lock(self):
+        """缓存文件的排他锁；多个群的滚动更新会并行读写同一个缓存文件"""
+        lock = open(f"{self.path}.lock", 'w')
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock
+
+    def _save_locked(self) -> None:
+        """重新读取磁盘上的缓存，只合并本进程改动过的部分后原子替换（调用方持有锁）"""
+        merged = self._empty()
+        merged.update(self._load())
+        if self._refreshed_contacts:
+            merged['contacts'] = self.data['contacts']
+            merged['contacts_fetched_at'] = self.data['contacts_fetched_at']
+        for wechat_id in self._touched_groups:
+            if wechat_id in self.data['chatrooms']:
+                merged['chatrooms'][wechat_id] = self.data['chatrooms'][wechat_id]
+            merged['aliases'][wechat_id] = {**merged['aliases'].get(wechat_id, {}),
+                                            **self.data['aliases'].get(wechat_id, {})}
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(merged, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+        self.data = merged
+
+    def save(self) -> None:
+        with self._lock():
+            self._save_locked()
+
+    def _expired(self, fetched_at: float) -> bool:
+        return time.time() - fetched_at > self.ttl
+
+    async def refresh(self, session, server_url: str, wechat_id: str) -> None:
+        """过期时批量刷新联系人列表和该群成员列表，每类数据只请求一次"""
+        if self._expired(self.data['contacts_fetched_at']):
+            contact_url = server_url.replace('/sse', '/api/v1/contact')
+            status, data = await aiohttp_get_text(session, contact_url)
+            if status == 200:
+                # 列: UserName, Alias, Remark, NickName
+                self.data['contacts'] = _parse_csv_names(data, 0, [2, 3])
+                self.data['contacts_fetched_at'] = time.time()
+                self._refreshed_contacts = True
+
+        room = self.data['chatrooms'].get(wechat_id)
+        if room is None or self._expired(room.get('fetched_at', 0)):
+            chatroom_url = server_url.replace('/sse', '/api/v1/chatroom')
+            status, data = await aiohttp_get_text(session, chatroom_url,
+                                                  params={'keyword': wechat_id, 'format': 'json'})
+            if status == 200:
+                self.data['chatrooms'][wechat_id] = {'members': _parse_members(data), 'fetched_at': time.time()}
+                self._touched_groups.add(wechat_id)
+
+    def display_name(self, wechat_id: str, sender_id: str, fallback: str) -> str:
+        """群昵称 > 联系人备注/昵称 > 聊天记录中的名字"""
+        room = self.data['chatrooms'].get(wechat_id) or {}
+        return (room.get('members', {}).get(sender_id)
+                or self.data['contacts'].get(sender_id)
+                or fallback or sender_id)
+
+    def alias(self, wechat_id: str, sender_id: str) -> str:
+        """群内稳定的短别名，跨天保持不变"""
+        aliases = self.data['aliases'].setdefault(wechat_id, {})
+        if sender_id not in aliases:
+            aliases[sender_id] = f"U{len(aliases) + 1}"
+            self._touched_groups.add(wechat_id)
+        return aliases[sender_id]
+
+    def rewrite_chatlog(self, wechat_id: str, chatlog_data: str) -> str:
+        """
+        把消息头改写为 "别名(别名) 时间"，并在开头加上本群发言者对照表
+
+        别名的读取、分配和保存在同一把锁内完成，并行运行的进程不会给不同发送者分配同一别名。
+        """
+        with self._lock():
+            # 以磁盘上的别名为准，其他进程可能刚为本群分配了新别名
+            disk_aliases = self._load().get('aliases', {}).get(wechat_id, {})
+            self.data['aliases'][wechat_id] = {**self.data['aliases'].get(wechat_id, {}), **disk_aliases}
+            result = self._rewrite(wechat_id, chatlog_data)
+            self._save_locked()
+        return result
+
+    def _rewrite(self, wechat_id: str, chatlog_data: str) -> str:
+        lines = []
+        legend: Dict[str, str] = {}
+        for line in chatlog_data.split('\n'):
+            match = HEADER_PATTERN.match(line)
+            if not match:
+                lines.append(line)
+                continue
+            sender_id = match.group('id')
+            alias = self.alias(wechat_id, sender_id)
+            if alias not in legend:
+                legend[alias] = self.display_name(wechat_id, sender_id, match.group('name'))
+            stamp = f"{match.group('date')} {match.group('time')}" if match.group('date') else match.group('time')
+            # 括号中重复别名，保持消息头可被 HEADER_PATTERN 解析
+            lines.append(f"{alias}({alias}) {stamp}")
+        if not legend:
+            return chatlog_data
+
+        ordered = sorted(legend.items(), key=lambda item: int(item[0][1:]))
+        header = ["### 发言者对照", "", "以下聊天记录用别名标记发言者，引用发言者时请使用对应的名字。", ""]
+        header += [f"- {alias}: {name}" for alias, name in ordered] + ["", ""]
+        return '\n'.join(header) + '\n'.join(lines)
+
+
+async def rewrite_with_contacts(server_url: str, wechat_id: str, chatlog_data: str,
+                                cache_path: str = DEFAULT_CACHE_FILE,
+                                ttl_hours: float = DEFAULT_TTL_HOURS) -> str:
+    """刷新（如已过期）联系人缓存后改写聊天记录，刷新失败时使用聊天记录中的名字"""
+    cache = ContactCache(cache_path, ttl_hours)
+    try:
+        import aiohttp
+
+        async with aiohttp.ClientSession() as session:
+            await cache.refresh(session, server_url, wechat_id)
+    except Exception as e:
+        print(f"警告: 刷新联系人缓存失败，使用已有缓存 - {e}")
+    return cache.rewrite_chatlog(wechat_id, chatlog_data)
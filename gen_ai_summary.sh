@@ -34,6 +34,9 @@ input_prompt="ai_prompt.md"
 gen_podcast_prompt="gen_podcast_prompt.md"
 
 ignore_user="bushcraftsecret"  # 要忽略的用户微信ID，为空则不过滤任何用户
+filter_rules="filter_rules.yml"  # 过滤规则文件（发送者/关键词/正则/消息类型），不存在则跳过
+sender_aliases=true  # 发送者改写为短别名并附对照表（联系人缓存），减少prompt长度
+tts_workers=2  # 播客并行合成进程数；每个进程都会加载一次完整TTS模型，按内存/显存调整
 
 # 时间和文件名配置
 hours=30  # 默认获取最近30小时的聊天记录
@@ -80,7 +83,7 @@ check_prerequisites() {
     fi
     
     # 检查必要的脚本文件
-    local scripts=("getrecentchatlogs.py" "analyze_logs.py" "post_wechat.py")
+    local scripts=("getrecentchatlogs.py" "analyze_logs.py" "post_wechat.py" "gen_html.py" "publish_web.py")
     for script in "${scripts[@]}"; do
         if [ ! -f "$script" ]; then
             error_echo "脚本文件 $script 不存在"
@@ -132,6 +135,13 @@ fetch_chat_logs() {
             get_logs_cmd+=" --nouser \"$ignore_user\""
             debug_echo "忽略用户: $ignore_user"
         fi
+        if [ -f "$filter_rules" ]; then
+            get_logs_cmd+=" --rules \"$filter_rules\""
+            debug_echo "过滤规则文件: $filter_rules"
+        fi
+        if [ "$sender_aliases" = true ]; then
+            get_logs_cmd+=" --aliases"
+        fi
         
         debug_echo "执行命令: $get_logs_cmd"
         
@@ -367,63 +377,35 @@ gen_podcast_mp3_url() {
         return 1
     fi
     
-    # 获取播客脚本的绝对路径（在切换目录之前）
-    local abs_podcast_script="$(pwd)/$podcast_script"
-    
-    # 切换到tts_home目录
-    debug_echo "切换到TTS目录: $tts_home"
-    cd "$tts_home" || {
-        error_echo "无法切换到TTS目录: $tts_home"
-        return 1
-    }
-    
-    # 运行TTS生成命令
+    # 解析带情绪标签的脚本，按段并行合成（按文本/情绪/强度/音色缓存），再按顺序拼接为MP3
     info_echo "开始生成TTS音频文件..."
-    # local tts_cmd="uv run gentts_emo.py --all -v ning.wav -f \"$abs_podcast_script\" -o \"$mp3_full_path\""
-    # debug_echo "执行TTS命令: $tts_cmd"
-    
-    # 执行TTS命令并等待完成
-    # if eval "$tts_cmd"; then
-    #    info_echo "TTS命令执行完成"
-    #else
-    #    error_echo "TTS命令执行失败"
-    #    cd - > /dev/null  # 切换回原目录
-    #    return 1
-    #fi
+    local tts_cmd="python3 podcast_tts.py -i \"$podcast_script\" -o \"$mp3_full_path\" --tts-home \"$tts_home\" -v ning.wav -j $tts_workers"
+    debug_echo "执行TTS命令: $tts_cmd"
     
-    # 切换回原目录
-    cd - > /dev/null
+    if ! eval "$tts_cmd"; then
+        error_echo "TTS命令执行失败"
+        return 1
+    fi
     
     # 检查mp3文件是否成功生成
-    local max_wait=300  # 最多等待5分钟
-    local wait_count=0
-    local check_interval=5  # 每5秒检查一次
-    
-    info_echo "检查MP3文件生成状态..."
-    while [ $wait_count -lt $max_wait ]; do
-        if [ -f "$mp3_full_path" ] && [ -s "$mp3_full_path" ]; then
-            info_echo "MP3文件生成成功: $mp3_full_path"
-            
-            # 显示文件信息
-            local file_size=$(stat -f%z "$mp3_full_path" 2>/dev/null || stat -c%s "$mp3_full_path" 2>/dev/null || echo "未知")
-            debug_echo "MP3文件大小: $file_size 字节"
-            
-            # 返回MP3访问URL
-            local mp3_access_url="$mp3_url/$mp3file.mp3"
-            info_echo "MP3访问URL: $mp3_access_url"
-            echo "$mp3_access_url"
-            
-            podcast_url="$mp3_access_url"
-            
-            return 0
-        fi
+    if [ -f "$mp3_full_path" ] && [ -s "$mp3_full_path" ]; then
+        info_echo "MP3文件生成成功: $mp3_full_path"
         
-        debug_echo "等待MP3文件生成... ($wait_count/$max_wait 秒)"
-        sleep $check_interval
-        wait_count=$((wait_count + check_interval))
-    done
+        # 显示文件信息
+        local file_size=$(stat -f%z "$mp3_full_path" 2>/dev/null || stat -c%s "$mp3_full_path" 2>/dev/null || echo "未知")
+        debug_echo "MP3文件大小: $file_size 字节"
+        
+        # 返回MP3访问URL
+        local mp3_access_url="$mp3_url/$mp3file.mp3"
+        info_echo "MP3访问URL: $mp3_access_url"
+        echo "$mp3_access_url"
+        
+        podcast_url="$mp3_access_url"
+        
+        return 0
+    fi
     
-    error_echo "MP3文件生成超时或失败: $mp3_full_path"
+    error_echo "MP3文件生成失败: $mp3_full_path"
  
     return 1
 }
@@ -497,29 +479,35 @@ generate_html() {
         fi
     fi
 
-    # 生成HTML文件名
+    # 先在当前目录生成HTML，再由 publish_web.py 原子发布到 web_home
     local html_file="ai_summary_${today_str}.html"
-    local html_full_path="$web_home/$html_file"
 
     debug_echo "HTML文件名: $html_file"
-    debug_echo "HTML完整路径: $html_full_path"
 
     # 使用gen_html.py生成HTML
     info_echo "使用AI将Markdown转换为HTML..."
-    local html_gen_cmd="python3 gen_html.py -i \"$output_file\" -o \"$html_full_path\""
+    local html_gen_cmd="python3 gen_html.py -i \"$output_file\" -o \"$html_file\""
 
     debug_echo "执行命令: $html_gen_cmd"
 
     if eval "$html_gen_cmd"; then
-        if [ -f "$html_full_path" ] && [ -s "$html_full_path" ]; then
-            info_echo "HTML生成成功: $html_full_path"
+        if [ -f "$html_file" ] && [ -s "$html_file" ]; then
+            info_echo "HTML生成成功: $html_file"
 
             # 显示文件信息
-            local file_size=$(stat -f%z "$html_full_path" 2>/dev/null || stat -c%s "$html_full_path" 2>/dev/null || echo "未知")
+            local file_size=$(stat -f%z "$html_file" 2>/dev/null || stat -c%s "$html_file" 2>/dev/null || echo "未知")
             debug_echo "HTML文件大小: $file_size 字节"
 
+            # 原子发布：预压缩版本、内容哈希文件名、增量更新日期索引；最后一行输出页面URL
+            local publish_output
+            if ! publish_output=$(python3 publish_web.py -i "$html_file" -d "$web_home" -u "$web_url" --date "$today_str"); then
+                error_echo "HTML发布失败: $publish_output"
+                return 1
+            fi
+            debug_echo "$publish_output"
+
             # 生成访问URL
-            local html_access_url="$web_url/$html_file"
+            local html_access_url=$(echo "$publish_output" | tail -n 1)
             info_echo "HTML访问URL: $html_access_url"
             echo ""
             echo "=========================================="
@@ -647,6 +635,23 @@ trap 'handle_error $? $LINENO' ERR
 # 参数解析
 hours=30  # 默认值
 
+# --profile [DIR]: getopts 不支持长参数，先取出；导出后流水线中每个Python脚本都按阶段剖析
+remaining_args=()
+while [ $# -gt 0 ]; do
+    if [ "$1" = "--profile" ]; then
+        if [ -n "$2" ] && [[ "$2" != -* ]]; then
+            export CLAUDE_WECHAT_PROFILE="$2"
+            shift
+        else
+            export CLAUDE_WECHAT_PROFILE="profiles/${date_str}"
+        fi
+    else
+        remaining_args+=("$1")
+    fi
+    shift
+done
+set -- "${remaining_args[@]}"
+
 while getopts "ht:" opt; do
     case $opt in
         h)
@@ -659,6 +664,7 @@ while getopts "ht:" opt; do
             echo "  -h             显示此帮助信息"
             echo "  -t HOURS       指定获取最近多少小时的数据 (默认: 30小时)"
             echo "  --no-debug     关闭调试信息"
+            echo "  --profile [DIR] 按阶段剖析各Python脚本，火焰图和报告写入 DIR (默认: profiles/<运行时间>)"
             echo ""
             echo "示例:"
             echo "  $0             # 获取最近30小时的数据"
@@ -6,12 +6,39 @@ import sys
 import os
 from datetime import datetime
 
+from profiling import add_profile_argument, enable as enable_profiling, stage
+from prompt_template import PromptTemplate
+
+HTML_INSTRUCTIONS = """请将本次数据中的markdown文本转换为结构清晰、认知负荷轻量的HTML页面。
+
+要求：
+1. 使用完整的HTML5结构（包含<!DOCTYPE html>、<html>、<head>、<body>等标签）
+2. 在<title>标签中使用本次数据中 TITLE 段给出的文档标题
+3. 添加适当的CSS样式，使页面简洁美观、易于阅读
+4. 使用响应式设计，适配移动端和桌面端
+5. 保持内容的层次结构清晰
+6. emoji和格式要正确显示
+7. 使用合适的字体和间距，降低认知负荷
+8. 添加适当的颜色和视觉元素，但不要过于花哨
+9. 直接输出完整的HTML代码，不要用markdown代码块包裹"""
+
+HTML_TRAILER = "请直接输出完整的HTML代码。"
+
+
+def build_html_prompt(title, markdown_content):
+    """Instructions as the static prefix; the title and markdown are the variable data"""
+    template = PromptTemplate([('html_instructions', HTML_INSTRUCTIONS)], trailer=HTML_TRAILER)
+    return template.render([('TITLE', title), ('MARKDOWN', markdown_content)])
+
+
 def main():
     parser = argparse.ArgumentParser(description='Convert markdown to HTML using Claude CLI')
     parser.add_argument('-i', '--input', required=True, help='Input markdown file')
     parser.add_argument('-o', '--output', required=True, help='Output HTML file')
+    add_profile_argument(parser)
 
     args = parser.parse_args()
+    enable_profiling(args.profile)
 
     # Check if input file exists
     if not os.path.exists(args.input):
@@ -29,33 +56,15 @@ def main():
         if lines and lines[0].startswith('#'):
             title = lines[0].lstrip('#').strip()
 
-        # Create prompt
-        prompt = f"""请将以下markdown文本转换为结构清晰、认知负荷轻量的HTML页面。
-
-要求：
-1. 使用完整的HTML5结构（包含<!DOCTYPE html>、<html>、<head>、<body>等标签）
-2. 在<title>标签中使用文档的标题：{title}
-3. 添加适当的CSS样式，使页面简洁美观、易于阅读
-4. 使用响应式设计，适配移动端和桌面端
-5. 保持内容的层次结构清晰
-6. emoji和格式要正确显示
-7. 使用合适的字体和间距，降低认知负荷
-8. 添加适当的颜色和视觉元素，但不要过于花哨
-9. 直接输出完整的HTML代码，不要用markdown代码块包裹
-
-Markdown内容：
-
-{markdown_content}
-
-请直接输出完整的HTML代码。
-"""
+        # Static instructions first as a byte-stable prefix, then the title and markdown data
+        with stage('build_prompt'):
+            prompt = build_html_prompt(title, markdown_content)
 
-        # Save prompt to temp file
-        date_str = datetime.now().strftime('%Y%m%d_%H%M%S')
-        temp_prompt_path = f"html_prompt_{date_str}.txt"
+            # Save prompt to temp file
+            date_str = datetime.now().strftime('%Y%m%d_%H%M%S')
+            temp_prompt_path = f"html_prompt_{date_str}.txt"
 
-        with open(temp_prompt_path, 'w', encoding='utf-8') as f:
-            f.write(prompt)
+            prompt.save(temp_prompt_path)
 
         print(f"Prompt saved to: {temp_prompt_path}")
 
@@ -72,23 +81,25 @@ Markdown内容：
         env['NODE_EXTRA_CA_CERTS'] = '/opt/homebrew/lib/node_modules/@anthropic-ai/claude-code/ca.pem'
 
         # Execute claude command
-        result = subprocess.run(claude_cmd_str, shell=True, capture_output=True, text=True, check=True, env=env)
+        with stage('claude'):
+            result = subprocess.run(claude_cmd_str, shell=True, capture_output=True, text=True, check=True, env=env)
         html_output = result.stdout.strip()
 
         # Extract HTML if wrapped in code blocks
-        if '```html' in html_output:
-            # Extract content between ```html and ```
-            start = html_output.find('```html') + 7
-            end = html_output.rfind('```')
-            if end > start:
-                html_output = html_output[start:end].strip()
-        elif '```' in html_output:
-            # Extract content between ``` and ```
-            parts = html_output.split('```')
-            if len(parts) >= 3:
-                html_output = parts[1].strip()
-                if html_output.startswith('html\n'):
-                    html_output = html_output[5:].strip()
+        with stage('extract'):
+            if '```html' in html_output:
+                # Extract content between ```html and ```
+                start = html_output.find('```html') + 7
+                end = html_output.rfind('```')
+                if end > start:
+                    html_output = html_output[start:end].strip()
+            elif '```' in html_output:
+                # Extract content between ``` and ```
+                parts = html_output.split('```')
+                if len(parts) >= 3:
+                    html_output = parts[1].strip()
+                    if html_output.startswith('html\n'):
+                        html_output = html_output[5:].strip()
 
         # Ensure HTML starts with <!DOCTYPE
         if not html_output.strip().startswith('<!DOCTYPE') and not html_output.strip().startswith('<html'):
@@ -11,7 +11,12 @@ import sys
 import os
 from datetime import datetime, timedelta
 from typing import Optional
-import aiohttp
+
+from chatlog_filter import ChatlogFilter
+from http_cassette import aiohttp_get_text, current_time
+from profiling import add_profile_argument, enable as enable_profiling, stage
+
+RESUME_OVERLAP_HOURS = 1  # --resume 时与已归档部分重叠的时长，重复消息由归档去重
 
 
 class WeChatLogClient:
@@ -20,6 +25,8 @@ class WeChatLogClient:
         
     async def get_chatlog_by_time(self, wechat_id: str, start_time: datetime, end_time: datetime) -> str:
         """根据时间范围获取微信群聊记录"""
+        import aiohttp
+        
         try:
             async with aiohttp.ClientSession() as session:
                 # 调试输出时间信息
@@ -42,21 +49,19 @@ class WeChatLogClient:
                 print(f"  API URL: {chatlog_url}")
                 print(f"  查询参数: {params}")
                 
-                async with session.get(chatlog_url, params=params) as response:
-                    if response.status == 200:
-                        chat_data = await response.text(encoding='utf-8', errors='ignore')
-                        return chat_data
-                    else:
-                        error_text = await response.text()
-                        return f"获取聊天记录失败: HTTP {response.status}\n错误信息: {error_text}"
+                status, chat_data = await aiohttp_get_text(session, chatlog_url, params=params)
+                if status == 200:
+                    return chat_data
+                else:
+                    return f"获取聊天记录失败: HTTP {status}\n错误信息: {chat_data}"
                         
         except Exception as e:
             return f"请求处理错误: {e}"
 
 
 def calculate_time_range(hours: int) -> tuple[datetime, datetime]:
-    """计算时间范围：当前时间和指定小时前的时间"""
-    end_time = datetime.now()
+    """计算时间范围：当前时间（回放时为录制结束时间）和指定小时前的时间"""
+    end_time = current_time()
     start_time = end_time - timedelta(hours=hours)
     return start_time, end_time
 
@@ -70,22 +75,6 @@ def generate_output_filename(wechat_id: str, output_dir: str, current_time: date
     return os.path.join(output_dir, filename)
 
 
-def filter_chatlog_data(chatlog_data: str, nouser: str) -> str:
-    """过滤聊天记录，跳过指定用户的消息"""
-    if not nouser:
-        return chatlog_data
-    
-    lines = chatlog_data.split('\n')
-    filtered_lines = []
-    
-    for line in lines:
-        # 简单的过滤逻辑：如果行中包含指定的用户ID，则跳过该行
-        if nouser not in line:
-            filtered_lines.append(line)
-    
-    return '\n'.join(filtered_lines)
-
-
 def format_chatlog_output(wechat_id: str, start_time: datetime, end_time: datetime, 
                          chatlog_data: str, hours: int) -> str:
     """格式化聊天记录输出"""
@@ -142,11 +131,46 @@ async def main():
     
     parser.add_argument(
         '--nouser',
+        action='append',
+        default=[],
+        help='要跳过的用户微信ID，可重复指定 (默认: 不跳过任何用户)'
+    )
+    
+    parser.add_argument(
+        '--archive',
+        default='',
+        help='压缩归档目录，抓取的消息追加到按群按月的归档文件，输出由归档渲染'
+    )
+    
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='与 --archive 一起使用: 从归档中最新消息前1小时开始抓取 (不早于 -t 的范围)，漏跑或失败的时段下次自动补齐'
+    )
+    
+    parser.add_argument(
+        '--aliases',
+        action='store_true',
+        help='将发送者改写为短别名并在开头附发言者对照表 (使用联系人缓存)'
+    )
+    
+    parser.add_argument(
+        '--contact-ttl',
+        type=float,
+        default=24,
+        help='联系人缓存有效期，单位小时 (默认: 24)'
+    )
+    
+    parser.add_argument(
+        '--rules',
         default='',
-        help='要跳过的用户微信ID (默认: 不跳过任何用户)'
+        help='过滤规则文件 (YAML: senders/keywords/regexes/types)'
     )
     
+    add_profile_argument(parser)
+    
     args = parser.parse_args()
+    enable_profiling(args.profile)
     
     # 读取MCP配置
     try:
@@ -166,6 +190,13 @@ async def main():
     
     # 1. 计算时间范围
     start_time, end_time = calculate_time_range(args.hours)
+    if args.resume and args.archive:
+        from chatlog_archive import latest_timestamp
+        
+        # 从上次归档到的位置接着抓（重叠1小时），缺口只要还在 -t 范围内就会补上
+        latest = latest_timestamp(args.archive, args.wechat_id)
+        if latest is not None:
+            start_time = max(start_time, datetime.fromtimestamp(latest) - timedelta(hours=RESUME_OVERLAP_HOURS))
     
     if args.verbose:
         print(f"查询时间范围: {start_time.strftime('%Y-%m-%d %H:%M:%S')} ~ {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
@@ -176,7 +207,8 @@ async def main():
     
     try:
         print(f"正在获取群聊 {args.wechat_id} 的聊天记录...")
-        chatlog_data = await client.get_chatlog_by_time(args.wechat_id, start_time, end_time)
+        with stage('fetch'):
+            chatlog_data = await client.get_chatlog_by_time(args.wechat_id, start_time, end_time)
         
         if args.verbose:
             print(f"获取到聊天记录 ({len(chatlog_data)} 字符)")
@@ -185,18 +217,61 @@ async def main():
         print(f"获取聊天记录失败: {e}")
         sys.exit(1)
     
-    # 3. 过滤聊天记录
-    if args.nouser:
+    # 3. 写入归档，输出改为归档中该时间范围的渲染视图（过滤在渲染后进行，归档保留原始消息）
+    if args.archive:
+        from chatlog_archive import append_messages, parse_chatlog, read_messages, render_markdown
+        
+        with stage('archive'):
+            messages = parse_chatlog(chatlog_data, start_time)
+            if messages:
+                try:
+                    added = append_messages(args.archive, args.wechat_id, messages)
+                    chatlog_data = render_markdown(read_messages(args.archive, args.wechat_id, start_time, end_time))
+                    if args.verbose:
+                        print(f"归档: 解析 {len(messages)} 条消息，新增 {added} 条 ({args.archive})")
+                except Exception as e:
+                    print(f"警告: 写入归档失败，使用原始聊天记录 - {e}")
+            elif args.verbose:
+                print("归档: 未解析到消息，跳过归档")
+    
+    # 4. 过滤聊天记录（所有规则编译为一个匹配器，单次扫描）
+    try:
+        if args.rules:
+            chatlog_filter = ChatlogFilter.from_file(args.rules, extra_senders=args.nouser)
+        else:
+            chatlog_filter = ChatlogFilter(senders=args.nouser)
+    except Exception as e:
+        print(f"错误: 加载过滤规则失败 - {e}")
+        sys.exit(1)
+    
+    if chatlog_filter:
         if args.verbose:
-            print(f"过滤用户: {args.nouser}")
-        chatlog_data = filter_chatlog_data(chatlog_data, args.nouser)
+            if args.nouser:
+                print(f"过滤用户: {', '.join(args.nouser)}")
+            if args.rules:
+                print(f"过滤规则文件: {args.rules}")
+        with stage('filter'):
+            chatlog_data = chatlog_filter.filter_text(chatlog_data)
+        if args.verbose:
+            print(chatlog_filter.report())
     
-    # 4. 格式化输出内容
-    formatted_output = format_chatlog_output(
-        args.wechat_id, start_time, end_time, chatlog_data, args.hours
-    )
+    # 5. 用缓存的联系人显示名生成短别名和对照表
+    if args.aliases:
+        from contact_cache import rewrite_with_contacts
+        
+        with stage('aliases'):
+            chatlog_data = await rewrite_with_contacts(server_url, args.wechat_id, chatlog_data,
+                                                       ttl_hours=args.contact_ttl)
+        if args.verbose:
+            print(f"发送者别名改写后 ({len(chatlog_data)} 字符)")
+    
+    # 6. 格式化输出内容
+    with stage('format'):
+        formatted_output = format_chatlog_output(
+            args.wechat_id, start_time, end_time, chatlog_data, args.hours
+        )
     
-    # 5. 确定输出文件路径
+    # 7. 确定输出文件路径
     if not args.output or args.output == '':
         # 如果没有指定输出路径，使用当前目录并生成标准文件名
         output_file = generate_output_filename(args.wechat_id, '.', end_time)
@@ -209,7 +284,7 @@ async def main():
         # 确保目录存在
         os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
     
-    # 6. 写入输出文件
+    # 8. 写入输出文件
     try:
         with open(output_file, 'w', encoding='utf-8') as f:
             f.write(formatted_output)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP 录制/回放 (cassette)
+录制模式下把 chatlog 和 webot 的每个请求、响应及耗时保存为 cassette 文件；
+回放模式下不访问网络，按原始速度或加速返回录制的响应，用于离线复现和性能对比。
+
+通过环境变量开启，跨进程（shell 流水线中的每个脚本）生效:
+    CLAUDE_WECHAT_RECORD=DIR          录制到 DIR
+    CLAUDE_WECHAT_REPLAY=DIR          从 DIR 回放
+    CLAUDE_WECHAT_REPLAY_SPEED=1.0    回放速度倍数，0 表示不等待
+claude_wechat.py 的全局参数 --record/--replay/--replay-speed 会设置这些环境变量。
+
+按"最近N小时"计算时间范围的脚本用 current_time() 代替 datetime.now()：回放时返回录制结束时间，
+时间范围与录制时一致，录制的消息不会因为落在窗口之外而被丢弃。
+"""
+
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+RECORD_ENV = 'CLAUDE_WECHAT_RECORD'
+REPLAY_ENV = 'CLAUDE_WECHAT_REPLAY'
+SPEED_ENV = 'CLAUDE_WECHAT_REPLAY_SPEED'
+
+# 每次运行都会变化的字段（查询时间范围、带时间戳的消息），回放时精确匹配失败后忽略这些字段再匹配
+VOLATILE_FIELDS = ('time', 'msg')
+
+
+class CassetteMiss(Exception):
+    """回放时找不到匹配的录制请求"""
+
+
+def _request_key(method: str, url: str, fields: Optional[dict], ignore_volatile: bool) -> str:
+    items = sorted((str(k), str(v)) for k, v in (fields or {}).items()
+                   if not (ignore_volatile and k in VOLATILE_FIELDS))
+    payload = json.dumps([method.upper(), url, items], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class Cassette:
+    def __init__(self, directory: str, replaying: bool, speed: float = 1.0):
+        self.directory = directory
+        self.replaying = replaying
+        self.speed = speed
+        self._exact: Dict[str, List[dict]] = {}
+        self._loose: Dict[str, List[dict]] = {}
+        self.recorded_end: Optional[datetime] = None
+        if replaying:
+            self._load()
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+    def _load(self) -> None:
+        if not os.path.isdir(self.directory):
+            raise CassetteMiss(f"cassette 目录不存在: {self.directory}")
+        # 文件名以录制时间开头，按文件名排序即按录制顺序
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith('.json'):
+                continue
+            with open(os.path.join(self.directory, name), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            self._exact.setdefault(entry['key'], []).append(entry)
+            self._loose.setdefault(entry['loose_key'], []).append(entry)
+            finished = self._finished_at(entry)
+            if self.recorded_end is None or finished > self.recorded_end:
+                self.recorded_end = finished
+
+    @staticmethod
+    def _finished_at(entry: dict) -> datetime:
+        if 'finished_at' in entry:
+            return datetime.fromisoformat(entry['finished_at'])
+        # 早期录制的 cassette 没有 finished_at
+        return datetime.fromisoformat(entry['started_at']) + timedelta(seconds=entry.get('elapsed', 0.0))
+
+    def lookup(self, method: str, url: str, fields: Optional[dict]) -> dict:
+        """取出匹配的录制响应，同一请求多次出现时按录制顺序依次返回"""
+        for table, ignore in ((self._exact, False), (self._loose, True)):
+            entries = table.get(_request_key(method, url, fields, ignore))
+            if entries:
+                # 最后一条保留，之后重复的同一请求继续返回它
+                return entries[0] if len(entries) == 1 else entries.pop(0)
+        raise CassetteMiss(f"cassette 中没有匹配的请求: {method} {url} {fields}")
+
+    def delay(self, entry: dict) -> float:
+        if self.speed <= 0:
+            return 0.0
+        return entry.get('elapsed', 0.0) / self.speed
+
+    def record(self, method: str, url: str, fields: Optional[dict], status: int, body: str,
+               started: float, elapsed: float) -> None:
+        key = _request_key(method, url, fields, False)
+        entry = {
+            'method': method.upper(),
+            'url': url,
+            'fields': {str(k): str(v) for k, v in (fields or {}).items()},
+            'key': key,
+            'loose_key': _request_key(method, url, fields, True),
+            'status': status,
+            'body': body,
+            'started_at': datetime.fromtimestamp(started).isoformat(timespec='milliseconds'),
+            'elapsed': round(elapsed, 4),
+            'finished_at': datetime.fromtimestamp(started + elapsed).isoformat(timespec='milliseconds'),
+        }
+        name = f"{time.time_ns()}_{os.getpid()}_{method.lower()}_{key[:12]}.json"
+        tmp_path = os.path.join(self.directory, f".{name}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, os.path.join(self.directory, name))
+
+
+_cassette: Optional[Cassette] = None
+_initialized = False
+
+
+def get_cassette() -> Optional[Cassette]:
+    """根据环境变量返回当前进程的 cassette，未开启时返回 None"""
+    global _cassette, _initialized
+    if not _initialized:
+        replay_dir = os.environ.get(REPLAY_ENV)
+        record_dir = os.environ.get(RECORD_ENV)
+        if replay_dir:
+            _cassette = Cassette(replay_dir, replaying=True, speed=float(os.environ.get(SPEED_ENV, '1.0')))
+        elif record_dir:
+            _cassette = Cassette(record_dir, replaying=False)
+        _initialized = True
+    return _cassette
+
+
+def current_time() -> datetime:
+    """当前时间；回放时为录制结束时间（最后一个录制请求完成的时间）"""
+    cassette = get_cassette()
+    if cassette is not None and cassette.replaying and cassette.recorded_end is not None:
+        return cassette.recorded_end
+    return datetime.now()
+
+
+async def aiohttp_get_text(session, url: str, params: Optional[dict] = None,
+                           encoding: str = 'utf-8', errors: str = 'ignore') -> Tuple[int, str]:
+    """GET 请求并返回 (状态码, 响应文本)，支持录制和回放"""
+    cassette = get_cassette()
+    if cassette is not None and cassette.replaying:
+        import asyncio
+
+        entry = cassette.lookup('GET', url, params)
+        await asyncio.sleep(cassette.delay(entry))
+        return entry['status'], entry['body']
+
+    started, start = time.time(), time.monotonic()
+    async with session.get(url, params=params) as response:
+        status = response.status
+        body = await response.text(encoding=encoding, errors=errors)
+    if cassette is not None:
+        cassette.record('GET', url, params, status, body, started, time.monotonic() - start)
+    return status, body
+
+
+def requests_post_text(url: str, data: dict, timeout: float) -> Tuple[int, str]:
+    """表单 POST 请求并返回 (状态码, 响应文本)，支持录制和回放"""
+    cassette = get_cassette()
+    if cassette is not None and cassette.replaying:
+        entry = cassette.lookup('POST', url, data)
+        time.sleep(cassette.delay(entry))
+        return entry['status'], entry['body']
+
+    import requests
+
+    started, start = time.time(), time.monotonic()
+    response = requests.post(url, data=data, timeout=timeout)
+    if cassette is not None:
+        cassette.record('POST', url, data, response.status_code, response.text, started,
+                        time.monotonic() - start)
+    return response.status_code, response.text
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+播客音频构建脚本
+将带情绪标签的播客脚本拆分为段落，通过进程池并行合成，按段缓存后按顺序拼接为MP3
+
+脚本格式: 每行一句，可选情绪标签前缀，例如
+    (happy,0.5)这个SDK让AI可以直接调用应用
+    大家好,群聊精选来了。
+
+缓存键为 (文本, 情绪, 强度, 音色) 的哈希，修改脚本后重新运行只会合成变化的行。
+
+Usage: python podcast_tts.py -i podcast_script.md -o ai_chat.mp3 --tts-home ~/tts -v ning.wav
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import select
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, NamedTuple, Optional
+
+from profiling import add_profile_argument, enable as enable_profiling, stage
+
+
+TAG_PATTERN = re.compile(r'^\((?P<emotion>[A-Za-z_]+)\s*,\s*(?P<intensity>\d+(?:\.\d+)?)\)\s*(?P<text>.*)$')
+MARKER_LINES = ('<!-- start -->', '<!-- end -->')
+DEFAULT_WORKERS = 2
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tts_worker.py')
+
+
+class Segment(NamedTuple):
+    index: int
+    text: str
+    emotion: Optional[str]
+    intensity: Optional[float]
+
+    def script_line(self) -> str:
+        """还原为带情绪标签的单行脚本"""
+        if self.emotion is None:
+            return self.text
+        return f"({self.emotion},{self.intensity:g}){self.text}"
+
+
+def parse_script(content: str) -> List[Segment]:
+    """解析播客脚本为段落列表，跳过空行和输出标记"""
+    segments = []
+    for raw in content.splitlines():
+        line = raw.strip()
+        if not line or line in MARKER_LINES:
+            continue
+        match = TAG_PATTERN.match(line)
+        if match:
+            text = match.group('text').strip()
+            if not text:
+                continue
+            segments.append(Segment(len(segments), text, match.group('emotion').lower(),
+                                    float(match.group('intensity'))))
+        else:
+            segments.append(Segment(len(segments), line, None, None))
+    return segments
+
+
+def segment_cache_key(segment: Segment, voice: str) -> str:
+    """(文本, 情绪, 强度, 音色) 的哈希"""
+    payload = json.dumps([segment.text, segment.emotion, segment.intensity, voice], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class TTSBackend(ABC):
+    """TTS后端接口：将单个段落合成为MP3文件"""
+
+    name = 'base'
+
+    def start(self) -> None:
+        """每个合成进程开始时调用一次，用于加载模型等一次性准备"""
+
+    @abstractmethod
+    def synthesize(self, segment: Segment, voice: str, output_path: str) -> None:
+        """合成单个段落到 output_path"""
+
+
+class GenTTSEmoBackend(TTSBackend):
+    """
+    通过常驻的 tts_worker.py 调用 tts_home 下的 gentts_emo 合成单句
+
+    start() 启动常驻进程并加载一次模型，之后每句只是一次请求/应答，不再为每句启动 uv 和加载模型。
+    """
+
+    name = 'gentts_emo'
+
+    def __init__(self, tts_home: str, timeout: int = 300):
+        self.tts_home = tts_home
+        self.timeout = timeout
+        self._proc = None
+        self._log = None
+
+    def start(self) -> None:
+        if self._proc is not None and self._proc.poll() is None:
+            return
+        # gentts_emo 的进度输出写入临时日志，常驻进程异常退出时附在错误信息中
+        self._log = tempfile.TemporaryFile('w+', encoding='utf-8')
+        self._proc = subprocess.Popen(['uv', 'run', 'python', WORKER_SCRIPT], cwd=self.tts_home,
+                                      stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=self._log,
+                                      text=True, encoding='utf-8', bufsize=1)
+
+    def _fail(self, message: str) -> RuntimeError:
+        """结束常驻进程（下一句会重新启动），返回附带日志尾部的错误"""
+        self._proc.kill()
+        self._proc.wait()
+        self._proc = None
+        self._log.seek(0)
+        tail = self._log.read()[-2000:]
+        self._log.close()
+        return RuntimeError(f"{message}\n{tail}" if tail else message)
+
+    def synthesize(self, segment: Segment, voice: str, output_path: str) -> None:
+        self.start()
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', encoding='utf-8', delete=False) as f:
+            f.write(segment.script_line() + '\n')
+            script_path = f.name
+        try:
+            request = {'script': script_path, 'voice': voice, 'output': output_path}
+            try:
+                self._proc.stdin.write(json.dumps(request, ensure_ascii=False) + '\n')
+                self._proc.stdin.flush()
+            except BrokenPipeError:
+                raise self._fail("TTS常驻进程已退出") from None
+            ready, _, _ = select.select([self._proc.stdout], [], [], self.timeout)
+            if not ready:
+                raise self._fail(f"段落 {segment.index} 合成超时 ({self.timeout}秒)")
+            line = self._proc.stdout.readline()
+            if not line:
+                raise self._fail("TTS常驻进程已退出")
+            reply = json.loads(line)
+            if not reply['ok']:
+                raise RuntimeError(f"段落 {segment.index} 合成失败: {reply['error']}")
+        finally:
+            os.remove(script_path)
+
+
+class LocalStubBackend(TTSBackend):
+    """本地替身后端：按文本长度生成静音MP3帧，用于测试流程，不依赖TTS环境"""
+
+    name = 'stub'
+
+    # MPEG-1 Layer III, 128kbps, 44.1kHz 的静音帧，每帧约26ms
+    FRAME = b'\xff\xfb\x90\x00' + b'\x00' * 413
+    FRAMES_PER_CHAR = 8
+
+    def synthesize(self, segment: Segment, voice: str, output_path: str) -> None:
+        with open(output_path, 'wb') as f:
+            f.write(self.FRAME * max(1, len(segment.text) * self.FRAMES_PER_CHAR))
+
+
+BACKENDS = {
+    GenTTSEmoBackend.name: GenTTSEmoBackend,
+    LocalStubBackend.name: LocalStubBackend,
+}
+
+
+# 每个进程池 worker 中的后端实例，由 _init_worker 设置并在该 worker 的所有任务间复用
+_worker_backend: Optional[TTSBackend] = None
+
+
+def _init_worker(backend: TTSBackend) -> None:
+    """进程池 worker 初始化：只在 worker 启动时准备一次后端（加载模型）"""
+    global _worker_backend
+    _worker_backend = backend
+    backend.start()
+
+
+def _synthesize_to_cache(segment: Segment, voice: str, cache_path: str) -> int:
+    """进程池任务：合成到临时文件后原子重命名进缓存"""
+    fd, tmp_path = tempfile.mkstemp(suffix='.mp3', dir=os.path.dirname(cache_path))
+    os.close(fd)
+    try:
+        _worker_backend.synthesize(segment, voice, tmp_path)
+        if os.path.getsize(tmp_path) == 0:
+            raise RuntimeError(f"段落 {segment.index} 合成结果为空")
+        os.replace(tmp_path, cache_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return segment.index
+
+
+def _strip_id3(data: bytes) -> bytes:
+    """去掉ID3v2头和ID3v1尾，便于直接拼接MP3帧"""
+    if data[:3] == b'ID3' and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        data = data[10 + size:]
+    if len(data) >= 128 and data[-128:-125] == b'TAG':
+        data = data[:-128]
+    return data
+
+
+def concat_mp3(paths: List[str], output_path: str) -> None:
+    """按顺序拼接MP3段落，先写临时文件再重命名"""
+    out_dir = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(out_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix='.mp3', dir=out_dir)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for path in paths:
+                with open(path, 'rb') as f:
+                    out.write(_strip_id3(f.read()))
+        # mkstemp 创建的文件权限为0600，发布目录中的音频需要可被Web服务读取
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, output_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def build_podcast(segments: List[Segment], backend: TTSBackend, voice: str, output_path: str,
+                  cache_dir: str, workers: int) -> dict:
+    """合成缺失的段落并拼接，返回统计信息"""
+    backend_cache = os.path.join(cache_dir, backend.name)
+    os.makedirs(backend_cache, exist_ok=True)
+
+    cache_paths = [os.path.join(backend_cache, segment_cache_key(s, voice) + '.mp3') for s in segments]
+    pending = {}
+    for segment, path in zip(segments, cache_paths):
+        if not os.path.exists(path) and path not in pending:
+            pending[path] = segment
+
+    if pending:
+        print(f"需要合成 {len(pending)}/{len(segments)} 个段落 (并发: {workers})")
+        # 合成在子进程中进行，主进程的剖析结果主要反映等待时间
+        with stage('synthesize'), ProcessPoolExecutor(max_workers=min(workers, len(pending)),
+                                                      initializer=_init_worker, initargs=(backend,)) as pool:
+            futures = {pool.submit(_synthesize_to_cache, seg, voice, path): seg
+                       for path, seg in pending.items()}
+            for future in as_completed(futures):
+                seg = futures[future]
+                future.result()
+                print(f"  段落 {seg.index + 1} 合成完成: {seg.text[:20]}")
+    else:
+        print(f"全部 {len(segments)} 个段落命中缓存")
+
+    with stage('concat'):
+        concat_mp3(cache_paths, output_path)
+    return {'segments': len(segments), 'synthesized': len(pending),
+            'cached': len(segments) - len(pending)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='并行合成带情绪标签的播客脚本为MP3')
+    parser.add_argument('-i', '--input', required=True, help='播客脚本文件')
+    parser.add_argument('-o', '--output', required=True, help='输出MP3文件路径')
+    parser.add_argument('-v', '--voice', default='ning.wav', help='音色参考文件 (默认: ning.wav)')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=GenTTSEmoBackend.name,
+                        help='TTS后端 (默认: gentts_emo)')
+    parser.add_argument('--tts-home', default='', help='gentts_emo.py 所在目录 (gentts_emo 后端必需)')
+    # 每个合成进程常驻一份完整的TTS模型，并发过高会耗尽内存/显存
+    parser.add_argument('-j', '--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'并行合成进程数，每个进程加载一次TTS模型 (默认: {DEFAULT_WORKERS})')
+    parser.add_argument('--cache-dir', default='tts_cache', help='段落音频缓存目录 (默认: tts_cache)')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    enable_profiling(args.profile)
+
+    if not os.path.exists(args.input):
+        print(f"错误：找不到播客脚本 {args.input}")
+        sys.exit(1)
+
+    if args.backend == GenTTSEmoBackend.name:
+        if not args.tts_home or not os.path.isdir(args.tts_home):
+            print(f"错误：TTS目录不存在: {args.tts_home}")
+            sys.exit(1)
+        if shutil.which('uv') is None:
+            print("错误：未找到 uv 命令")
+            sys.exit(1)
+        backend = GenTTSEmoBackend(os.path.abspath(args.tts_home))
+    else:
+        backend = LocalStubBackend()
+
+    with stage('parse'), open(args.input, 'r', encoding='utf-8') as f:
+        segments = parse_script(f.read())
+    if not segments:
+        print("错误：播客脚本中没有可合成的段落")
+        sys.exit(1)
+
+    start = time.monotonic()
+    try:
+        stats = build_podcast(segments, backend, args.voice, args.output,
+                              os.path.abspath(args.cache_dir), max(1, args.workers))
+    except subprocess.CalledProcessError as e:
+        print(f"错误：TTS合成失败 - {e}")
+        print(f"错误输出：{e.stderr}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"错误：生成播客音频失败 - {e}")
+        sys.exit(1)
+
+    print(f"播客音频已保存到: {args.output}")
+    print(f"段落: {stats['segments']}，新合成: {stats['synthesized']}，缓存命中: {stats['cached']}，"
+          f"耗时: {time.monotonic() - start:.1f}秒")
+
+
+if __name__ == '__main__':
+    main()
@@ -8,12 +8,14 @@
 import argparse
 import sys
 import os
-import yaml
-import requests
-import xml.etree.ElementTree as ET
 from datetime import datetime
 from typing import Optional
 
+from http_cassette import requests_post_text
+from profiling import add_profile_argument, enable as enable_profiling, stage
+
+# yaml、requests、xml.etree 在用到时才导入，缩短每次发送的启动时间
+
 
 def load_config() -> Optional[str]:
     """
@@ -22,6 +24,8 @@ def load_config() -> Optional[str]:
     Returns:
         str: webot_url 的值，如果读取失败返回 None
     """
+    import yaml
+    
     try:
         # 检查配置文件是否存在
         if not os.path.exists('config.yml'):
@@ -95,6 +99,9 @@ def send_wechat_message(webot_url: str, wid: str, message: str) -> bool:
     Returns:
         bool: 发送成功返回True，失败返回False
     """
+    import json
+    import requests
+    
     try:
         # 生成当前时间戳
         timestamp = datetime.now().strftime('[%Y%m%d %H:%M:%S.%f)')[:-3] + ']'
@@ -110,25 +117,25 @@ def send_wechat_message(webot_url: str, wid: str, message: str) -> bool:
         
         # 发送HTTP POST请求
         print(f"正在发送消息到群组 {wid}...")
-        response = requests.post(webot_url, data=post_data, timeout=30)
+        status_code, response_text = requests_post_text(webot_url, post_data, timeout=30)
         
         # 检查HTTP响应状态
-        if response.status_code != 200:
-            print(f"错误：HTTP请求失败，状态码：{response.status_code}")
+        if status_code != 200:
+            print(f"错误：HTTP请求失败，状态码：{status_code}")
             return False
             
         # 解析响应（支持JSON和XML格式）
         try:
             # 首先尝试解析JSON
-            import json
-            response_data = json.loads(response.text)
+            response_data = json.loads(response_text)
             code = str(response_data.get('code', ''))
             msg = response_data.get('msg', '未知错误')
             
         except json.JSONDecodeError:
-            # 如果JSON解析失败，尝试解析XML
+            # 如果JSON解析失败，尝试解析XML（只有非JSON响应才需要导入XML解析器）
+            import xml.etree.ElementTree as ET
             try:
-                root = ET.fromstring(response.text)
+                root = ET.fromstring(response_text)
                 code_element = root.find('.//code')
                 msg_element = root.find('.//msg')
                 
@@ -141,7 +148,7 @@ def send_wechat_message(webot_url: str, wid: str, message: str) -> bool:
                 
             except ET.ParseError as e:
                 print(f"错误：解析响应失败（既不是有效的JSON也不是有效的XML）- {e}")
-                print(f"响应内容：{response.text}")
+                print(f"响应内容：{response_text}")
                 return False
         
         # 检查返回码
@@ -174,9 +181,11 @@ def main():
     parser = argparse.ArgumentParser(description='发送纯文本消息到微信群')
     parser.add_argument('-i', '--input', required=True, help='输入的纯文本文件路径')
     parser.add_argument('-wid', '--wechat-id', required=True, help='微信群ID号')
+    add_profile_argument(parser)
     
     # 解析命令行参数
     args = parser.parse_args()
+    enable_profiling(args.profile)
     
     # 读取配置文件
     print("正在读取配置文件...")
@@ -196,7 +205,8 @@ def main():
         print("警告：消息内容为空，继续发送...")
     
     # 发送微信消息
-    success = send_wechat_message(webot_url, args.wechat_id, message_content)
+    with stage('post'):
+        success = send_wechat_message(webot_url, args.wechat_id, message_content)
     
     if success:
         print("程序执行完成")
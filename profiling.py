@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按阶段的性能剖析 (--profile)
+把脚本的主要步骤包在 stage('名称') 中，开启剖析后每个阶段同时记录:
+  - cProfile 统计，保存为 <run>.<阶段>.prof（可用 pstats / snakeviz 查看）
+  - 采样调用栈，合并为 <run>.folded（collapsed stack 格式，可直接交给 flamegraph.pl 或 speedscope）
+  - tracemalloc 快照差值和峰值内存
+运行结束时在标准错误输出各阶段耗时、累计耗时最高的函数和分配最多的代码行，同时写入 <run>.report.txt。
+报告走标准错误，不影响 shell 脚本读取标准输出的最后一行。
+
+通过环境变量开启，跨进程（shell 流水线中的每个脚本）生效:
+    CLAUDE_WECHAT_PROFILE=DIR    剖析结果写入 DIR
+各脚本的 --profile [DIR] 参数和 claude_wechat.py 的全局 --profile 会设置这个环境变量。
+未开启时 stage() 不做任何事，也不导入 cProfile/tracemalloc。
+"""
+
+import os
+import sys
+import time
+from typing import Optional
+
+PROFILE_ENV = 'CLAUDE_WECHAT_PROFILE'
+DEFAULT_PROFILE_DIR = 'profiles'
+SAMPLE_INTERVAL = 0.005  # 采样间隔（秒）
+TOP_N = 15
+
+
+def add_profile_argument(parser) -> None:
+    parser.add_argument('--profile', nargs='?', const=DEFAULT_PROFILE_DIR, default=None, metavar='DIR',
+                        help=f'按阶段剖析性能，火焰图和报告写入 DIR (默认: {DEFAULT_PROFILE_DIR})')
+
+
+def enable(directory: Optional[str]) -> None:
+    """开启剖析；directory 为空时保持环境变量原样（可能由上层脚本设置）"""
+    if directory:
+        os.environ[PROFILE_ENV] = directory
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _function_label(key) -> str:
+    filename, line, name = key
+    if filename == '~':  # 内置函数
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+class _StackSampler:
+    """后台线程定时采样目标线程的调用栈，按 collapsed stack 计数"""
+
+    def __init__(self, stage_name: str, thread_id: int, counts):
+        import threading
+
+        self.stage_name = stage_name
+        self.thread_id = thread_id
+        self.counts = counts
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                stack.append(self.stage_name)
+                self.counts[';'.join(reversed(stack))] += 1
+
+
+class Profiler:
+    def __init__(self, directory: str):
+        import atexit
+        import tracemalloc
+        from collections import Counter
+        from datetime import datetime
+
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        script = os.path.basename(sys.argv[0]).replace('.py', '').replace(' ', '_') or 'python'
+        self.run_id = f"{script}_{datetime.now():%Y%m%d_%H%M%S}_{os.getpid()}"
+        self.stages = []
+        self.folded = Counter()
+        self._active = None
+        self._own_files = (os.path.abspath(__file__), tracemalloc.__file__)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        atexit.register(self.report)
+
+    def path(self, suffix: str) -> str:
+        return os.path.join(self.directory, f"{self.run_id}.{suffix}")
+
+    def stage(self, name: str):
+        return _Stage(self, name)
+
+    def _snapshot(self):
+        import tracemalloc
+
+        return tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, f) for f in self._own_files]
+            + [tracemalloc.Filter(False, '<frozen importlib._bootstrap*>')])
+
+    def _begin(self, name: str) -> dict:
+        import cProfile
+        import threading
+        import tracemalloc
+
+        self._active = name
+        state = {'name': name, 'before': self._snapshot()}
+        tracemalloc.reset_peak()
+        state['sampler'] = _StackSampler(name, threading.get_ident(), self.folded)
+        state['profile'] = cProfile.Profile()
+        state['wall'], state['cpu'] = time.perf_counter(), time.process_time()
+        state['sampler'].start()
+        state['profile'].enable()
+        return state
+
+    def _end(self, state: dict) -> None:
+        import tracemalloc
+
+        state['profile'].disable()
+        wall = time.perf_counter() - state['wall']
+        cpu = time.process_time() - state['cpu']
+        state['sampler'].stop()
+        _, peak = tracemalloc.get_traced_memory()
+        allocations = [s for s in self._snapshot().compare_to(state['before'], 'lineno') if s.size_diff > 0]
+        self._active = None
+
+        # 快照之后再导入，避免 pstats 自身的分配计入阶段
+        import pstats
+
+        name = state['name']
+        # 同名阶段多次运行（如逐个文件处理）时按序号区分 .prof 文件
+        repeat = sum(1 for s in self.stages if s['name'] == name)
+        prof_path = self.path(f"{name}.{repeat + 1}.prof" if repeat else f"{name}.prof")
+        state['profile'].dump_stats(prof_path)
+        stats = pstats.Stats(state['profile']).stats
+        top = sorted(((value[3], value[2], value[1], key) for key, value in stats.items()
+                      if key[0] not in self._own_files),
+                     key=lambda row: row[0], reverse=True)[:TOP_N]
+        self.stages.append({
+            'name': name, 'wall': wall, 'cpu': cpu, 'peak': peak, 'prof': prof_path,
+            'allocated': sum(s.size_diff for s in allocations),
+            'top': top, 'allocations': allocations[:TOP_N],
+        })
+
+    def report(self) -> None:
+        """写出火焰图数据并输出各阶段的耗时和分配报告"""
+        if not self.stages:
+            return
+        folded_path = self.path('folded')
+        with open(folded_path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.folded.items()):
+                f.write(f"{stack} {count}\n")
+
+        mb = 1024 * 1024
+        lines = [f"==== 性能剖析: {self.run_id} ====",
+                 f"{'阶段':<16}{'墙钟(s)':>10}{'CPU(s)':>10}{'峰值(MB)':>10}{'新增(MB)':>10}"]
+        for s in self.stages:
+            lines.append(f"{s['name']:<18}{s['wall']:>10.3f}{s['cpu']:>10.3f}"
+                         f"{s['peak'] / mb:>10.2f}{s['allocated'] / mb:>10.2f}")
+        for s in self.stages:
+            lines += ["", f"[{s['name']}] 累计耗时最高的函数:",
+                      f"  {'累计(s)':>9}{'自身(s)':>9}{'调用次数':>10}  函数"]
+            for cumulative, total, calls, key in s['top']:
+                lines.append(f"  {cumulative:>9.3f}{total:>9.3f}{calls:>10}  {_function_label(key)}")
+            if s['allocations']:
+                lines += [f"[{s['name']}] 新增内存最多的代码行:"]
+                for stat in s['allocations']:
+                    frame = stat.traceback[0]
+                    lines.append(f"  {stat.size_diff / 1024:>9.1f} KiB {stat.count_diff:>8} 块  "
+                                 f"{frame.filename}:{frame.lineno}")
+        lines += ["", f"火焰图 (flamegraph.pl / speedscope): {folded_path}",
+                  "cProfile: " + ', '.join(s['prof'] for s in self.stages)]
+        text = '\n'.join(lines) + '\n'
+
+        with open(self.path('report.txt'), 'w', encoding='utf-8') as f:
+            f.write(text)
+        sys.stderr.write(text)
+
+
+class _Stage:
+    """阶段上下文管理器；嵌套的阶段并入外层阶段，不单独统计"""
+
+    def __init__(self, profiler: Optional[Profiler], name: str):
+        self.profiler = profiler
+        self.name = name
+        self._state = None
+
+    def __enter__(self):
+        if self.profiler is not None and self.profiler._active is None:
+            self._state = self.profiler._begin(self.name)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._state is not None:
+            self.profiler._end(self._state)
+            self._state = None
+        return False
+
+
+_profiler: Optional[Profiler] = None
+
+
+def get_profiler() -> Optional[Profiler]:
+    """根据环境变量返回当前进程的剖析器，未开启时返回 None"""
+    global _profiler
+    directory = os.environ.get(PROFILE_ENV)
+    if _profiler is None and directory:
+        _profiler = Profiler(directory)
+    return _profiler
+
+
+def stage(name: str) -> _Stage:
+    """剖析一个阶段: with stage('filter'): ...；未开启剖析时为空操作"""
+    return _Stage(get_profiler(), name)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Prefix-stable prompt templates
+
+All static instructions (prompt file, output format, fixed notes) are laid
+out first as a deterministic, byte-stable prefix; the variable chat data
+comes last. Repeated daily runs and retries with the same prompt file then
+share an identical prefix, which providers can serve from their prompt
+cache. The prompt still reaches claude as one `claude -p` string, so only
+the byte-stable ordering is delivered; no explicit cache breakpoint is set.
+Segment boundaries are recorded next to the saved prompt so prefix
+stability can be checked.
+"""
+
+import hashlib
+import json
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+DATA_BOUNDARY = "--- 以下为本次数据 ---"
+
+
+def normalize_text(text: str) -> str:
+    """Normalize line endings and surrounding whitespace so identical content is byte-identical"""
+    return text.replace('\r\n', '\n').replace('\r', '\n').strip()
+
+
+class PromptSegment(NamedTuple):
+    name: str
+    text: str
+    static: bool
+
+
+class RenderedPrompt:
+    """A prompt made of ordered segments, static prefix first"""
+
+    def __init__(self, segments: List[PromptSegment]):
+        self.segments = segments
+
+    @property
+    def text(self) -> str:
+        return ''.join(s.text for s in self.segments)
+
+    @property
+    def prefix(self) -> str:
+        """Leading static segments, the part that is cacheable across calls"""
+        parts = []
+        for segment in self.segments:
+            if not segment.static:
+                break
+            parts.append(segment.text)
+        return ''.join(parts)
+
+    @property
+    def prefix_hash(self) -> str:
+        return hashlib.sha256(self.prefix.encode('utf-8')).hexdigest()
+
+    def boundaries(self) -> List[dict]:
+        """Byte offset, length and hash of every segment"""
+        result = []
+        offset = 0
+        for segment in self.segments:
+            data = segment.text.encode('utf-8')
+            result.append({
+                'name': segment.name,
+                'static': segment.static,
+                'offset': offset,
+                'length': len(data),
+                'sha256': hashlib.sha256(data).hexdigest(),
+            })
+            offset += len(data)
+        return result
+
+    def save(self, path: str) -> None:
+        """Write the prompt text and its segment boundaries to <path>.segments.json"""
+        with open(path, 'w', encoding='utf-8', newline='\n') as f:
+            f.write(self.text)
+        with open(f"{path}.segments.json", 'w', encoding='utf-8') as f:
+            json.dump({'prefix_sha256': self.prefix_hash,
+                       'prefix_length': len(self.prefix.encode('utf-8')),
+                       'segments': self.boundaries()}, f, ensure_ascii=False, indent=2)
+
+
+class PromptTemplate:
+    """Static instruction segments followed by variable data sections and an optional static trailer"""
+
+    def __init__(self, instructions: Iterable[Tuple[str, str]], trailer: Optional[str] = None):
+        self.instructions = [PromptSegment(name, normalize_text(text) + "\n\n", True)
+                             for name, text in instructions if normalize_text(text)]
+        self.trailer = normalize_text(trailer) + "\n" if trailer else None
+
+    def render(self, sections: Iterable[Tuple[str, str]]) -> RenderedPrompt:
+        segments = list(self.instructions)
+        # The boundary line is static too, so the cacheable prefix ends exactly before the first data byte
+        segments.append(PromptSegment('data_boundary', DATA_BOUNDARY + "\n\n", True))
+        for name, content in sections:
+            segments.append(PromptSegment(name, f"=== {name} ===\n{normalize_text(content)}\n\n", False))
+        if self.trailer:
+            # Trailing reminders sit after the data and do not affect the cached prefix
+            segments.append(PromptSegment('trailer', self.trailer, False))
+        return RenderedPrompt(segments)
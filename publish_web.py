@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态页面发布脚本
+把生成的HTML发布到 web_home:
+  - 先写临时文件再 rename，读者不会读到写了一半的页面
+  - 生成 .gz（以及安装了 brotli 时的 .br）预压缩版本，供 Web 服务直接返回给移动端
+  - 页面以内容哈希命名（ai_summary_YYYYMMDD.<hash>.html），可长期缓存，同时更新不带哈希的固定名称；
+    同一天重新发布时旧的哈希页面保留（链接已发到群里），清单和固定名称指向新页面
+  - 增量更新 index.json 清单并重新渲染日期索引页，不重建历史页面
+
+Usage: python publish_web.py -i ai_summary_20251107.html -d /var/www/ai -u https://example.com/ai --date 20251107
+"""
+
+import argparse
+import gzip
+import hashlib
+import html
+import json
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime
+from typing import Dict, Optional
+
+from profiling import add_profile_argument, enable as enable_profiling, stage
+
+MANIFEST_FILE = 'index.json'
+INDEX_FILE = 'index.html'
+HASH_LENGTH = 10
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """同目录临时文件写入并 fsync 后 rename，保证读者看到的要么是旧文件要么是完整的新文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.publish_', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_with_variants(path: str, data: bytes) -> None:
+    """写入文件及其预压缩版本；压缩版本先写，保证主文件可见时它们已就绪"""
+    # mtime=0 让相同内容的 .gz 字节一致
+    write_atomic(f"{path}.gz", gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        write_atomic(f"{path}.br", brotli.compress(data, quality=11))
+    write_atomic(path, data)
+
+
+def extract_title(page: str, default: str) -> str:
+    match = re.search(r'<title>(.*?)</title>', page, re.IGNORECASE | re.DOTALL)
+    return html.unescape(match.group(1).strip()) if match else default
+
+
+def load_manifest(web_home: str) -> Dict[str, dict]:
+    path = os.path.join(web_home, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def render_index(manifest: Dict[str, dict], web_url: str) -> str:
+    """按日期倒序渲染索引页"""
+    items = []
+    for date in sorted(manifest, reverse=True):
+        entry = manifest[date]
+        label = datetime.strptime(date, '%Y%m%d').strftime('%Y-%m-%d')
+        href = f"{web_url}/{entry['file']}" if web_url else entry['file']
+        items.append(f'    <li><a href="{html.escape(href)}"><span class="date">{label}</span> '
+                     f'{html.escape(entry["title"])}</a></li>')
+    return """<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>AI资讯摘要归档</title>
+<style>
+body { font-family: -apple-system, "PingFang SC", "Helvetica Neue", sans-serif; max-width: 720px; margin: 0 auto; padding: 16px; color: #333; line-height: 1.6; }
+h1 { font-size: 1.4em; }
+ul { list-style: none; padding: 0; }
+li { padding: 10px 0; border-bottom: 1px solid #eee; }
+a { color: #1a73e8; text-decoration: none; }
+.date { color: #888; margin-right: 8px; font-variant-numeric: tabular-nums; }
+</style>
+</head>
+<body>
+<h1>AI资讯摘要归档</h1>
+<ul>
+""" + '\n'.join(items) + """
+</ul>
+</body>
+</html>
+"""
+
+
+def publish(input_path: str, web_home: str, web_url: str, date: str, prefix: str,
+            title: Optional[str] = None) -> str:
+    """发布页面并更新索引，返回带哈希的页面URL"""
+    with open(input_path, 'rb') as f:
+        data = f.read()
+    if not data.strip():
+        raise ValueError(f"输入文件为空: {input_path}")
+
+    os.makedirs(web_home, exist_ok=True)
+    digest = content_hash(data)
+    stable_name = f"{prefix}_{date}.html"
+    hashed_name = f"{prefix}_{date}.{digest}.html"
+
+    # 带哈希的文件内容不变，已存在时跳过
+    hashed_path = os.path.join(web_home, hashed_name)
+    with stage('write_page'):
+        if not os.path.exists(hashed_path):
+            write_with_variants(hashed_path, data)
+        write_with_variants(os.path.join(web_home, stable_name), data)
+
+    manifest = load_manifest(web_home)
+    previous = manifest.get(date) or {}
+    # 旧的哈希页面不删除，只在清单中记录，已发出的链接保持有效
+    superseded = list(previous.get('superseded', []))
+    if previous.get('file') and previous['file'] != hashed_name and previous['file'] not in superseded:
+        superseded.append(previous['file'])
+    manifest[date] = {
+        'file': hashed_name,
+        'stable': stable_name,
+        'title': title or extract_title(data.decode('utf-8', errors='ignore'), stable_name),
+        'hash': digest,
+        'size': len(data),
+        'published_at': datetime.now().isoformat(timespec='seconds'),
+        'superseded': [name for name in superseded if name != hashed_name],
+    }
+
+    with stage('write_index'):
+        write_atomic(os.path.join(web_home, MANIFEST_FILE),
+                     json.dumps(manifest, ensure_ascii=False, indent=1, sort_keys=True).encode('utf-8'))
+        write_with_variants(os.path.join(web_home, INDEX_FILE), render_index(manifest, web_url).encode('utf-8'))
+
+    return f"{web_url}/{hashed_name}" if web_url else hashed_name
+
+
+def main():
+    parser = argparse.ArgumentParser(description='原子发布HTML页面到web_home并更新日期索引')
+    parser.add_argument('-i', '--input', required=True, help='生成的HTML文件')
+    parser.add_argument('-d', '--web-home', required=True, help='Web根目录')
+    parser.add_argument('-u', '--web-url', default='', help='Web访问URL前缀')
+    parser.add_argument('--date', default=datetime.now().strftime('%Y%m%d'), help='页面日期 YYYYMMDD (默认: 今天)')
+    parser.add_argument('--prefix', default='ai_summary', help='页面文件名前缀 (默认: ai_summary)')
+    parser.add_argument('--title', default=None, help='索引中显示的标题 (默认: 页面<title>)')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    enable_profiling(args.profile)
+
+    if not os.path.exists(args.input):
+        print(f"错误: 找不到输入文件 {args.input}")
+        sys.exit(1)
+    try:
+        datetime.strptime(args.date, '%Y%m%d')
+    except ValueError:
+        print(f"错误: 日期格式无效 {args.date}，应为 YYYYMMDD")
+        sys.exit(1)
+
+    try:
+        url = publish(args.input, args.web_home, args.web_url.rstrip('/'), args.date, args.prefix, args.title)
+    except Exception as e:
+        print(f"错误: 发布失败 - {e}")
+        sys.exit(1)
+
+    if brotli is None:
+        print("提示: 未安装 brotli，只生成 .gz 预压缩版本")
+    print(f"发布完成，索引已更新: {os.path.join(args.web_home, INDEX_FILE)}")
+    # 最后一行输出页面URL，供 shell 脚本读取
+    print(url)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,18 @@
 #!/usr/bin/env python3
 """
 Query WeChat ID Script
-Usage: python querywechatid.py "AI软工"
+Usage: python querywechatid.py "AI软工" [--profile [DIR]]
 Returns the WeChat ID if found, otherwise returns null
 """
 
+import argparse
 import sys
 import asyncio
-import aiohttp
 import json
 
+from http_cassette import aiohttp_get_text
+from profiling import add_profile_argument, enable as enable_profiling, stage
+
 
 class WeChatIDQuery:
     def __init__(self, server_url: str):
@@ -17,45 +20,47 @@ class WeChatIDQuery:
         
     async def query_wechat_id(self, search_term: str) -> str:
         """Query WeChat ID by group name or partial name"""
+        import aiohttp
+        
         try:
             async with aiohttp.ClientSession() as session:
                 # Get chatroom list
                 chatroom_url = self.server_url.replace('/sse', '/api/v1/chatroom')
                 
-                async with session.get(chatroom_url) as response:
-                    if response.status == 200:
-                        chatroom_data = await response.text(encoding='utf-8', errors='ignore')
-                        
-                        # Parse CSV data (skip header)
-                        lines = chatroom_data.strip().split('\n')
-                        if len(lines) <= 1:
-                            return "null"
-                        
-                        # Search for matching groups
-                        for line in lines[1:]:  # Skip header
-                            parts = line.split(',')
-                            if len(parts) >= 3:
-                                wechat_id = parts[0]
-                                group_name = parts[2] if len(parts) > 2 else ""
-                                
-                                # Check if search term matches group name (case insensitive)
-                                if search_term.lower() in group_name.lower():
-                                    return wechat_id
-                        
-                        return "null"
-                    else:
+                status, chatroom_data = await aiohttp_get_text(session, chatroom_url)
+                if status == 200:
+                    # Parse CSV data (skip header)
+                    lines = chatroom_data.strip().split('\n')
+                    if len(lines) <= 1:
                         return "null"
-                        
+                    
+                    # Search for matching groups
+                    for line in lines[1:]:  # Skip header
+                        parts = line.split(',')
+                        if len(parts) >= 3:
+                            wechat_id = parts[0]
+                            group_name = parts[2] if len(parts) > 2 else ""
+                            
+                            # Check if search term matches group name (case insensitive)
+                            if search_term.lower() in group_name.lower():
+                                return wechat_id
+                    
+                    return "null"
+                else:
+                    return "null"
+                    
         except Exception as e:
             return "null"
 
 
 async def main():
-    if len(sys.argv) != 2:
-        print("Usage: python querywechatid.py \"search_term\"")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description='Query the WeChat ID of a contact or group')
+    parser.add_argument('search_term', help='Name to search for, e.g. "AI软工"')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    enable_profiling(args.profile)
     
-    search_term = sys.argv[1]
+    search_term = args.search_term
     
     # Read MCP configuration
     try:
@@ -73,7 +78,8 @@ async def main():
     
     # Query WeChat ID
     query = WeChatIDQuery(server_url)
-    result = await query.query_wechat_id(search_term)
+    with stage('query'):
+        result = await query.query_wechat_id(search_term)
     print(result)
 
 
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Incremental rolling summaries
+
+update: summarize each group's new archived messages every few hours and
+        store the partial summary as rolling/<group>/<start_ts>_<end_ts>.md
+merge:  at send time, merge the partials inside the window plus each group's
+        raw messages archived after its last partial with a single claude
+        call, using the same prompt and marker-extraction flow as
+        analyze_logs.py
+
+Usage:
+    python rolling_summary.py update -d archive -wid 27587714869@chatroom --nouser bushcraftsecret
+    python rolling_summary.py merge -p ai_prompt.md -o ai_summary.md -d archive -wid 27587714869@chatroom 43543695744@chatroom
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+from analyze_logs import (build_claude_env, build_combined_prompt, extract_marked_content,
+                          hedge_delay_from_history, run_claude, run_claude_hedged,
+                          save_combined_prompt, save_latency_sample)
+from chatlog_archive import clean_wechat_id, read_messages, render_markdown
+from chatlog_filter import ChatlogFilter
+from http_cassette import current_time
+from profiling import add_profile_argument, enable as enable_profiling, stage
+
+DEFAULT_PARTIAL_PROMPT = """以下是一个微信群在一个时间段内的聊天记录。
+请提炼这一时段的主要话题、关键观点、分享的链接和工具，保留发言者和关键细节，
+作为后续合并为全天摘要的素材，不需要开场白和总结语。"""
+
+# Hedge delays come from each prompt kind's own latency history; small partial/merge
+# prompts must not pull down the p90 used by the full analyze_logs.py run
+UPDATE_LATENCY_HISTORY_FILE = "rolling_latency_history.json"
+MERGE_LATENCY_HISTORY_FILE = "merge_latency_history.json"
+
+MERGE_PREAMBLE = """注意：下面提供的主要是按群、按时间段生成的分段摘要（按时间顺序排列），
+标题注明"原始聊天记录"的部分是该群最后一个分段之后尚未摘要的新消息。
+请合并同一话题在不同时间段的内容，去除重复，再按上述要求输出最终结果。"""
+
+RAW_SECTION_SUFFIX = "原始聊天记录"
+
+
+def list_partials(rolling_dir, wechat_id):
+    """Return [(start_ts, end_ts, path)] sorted by start time"""
+    group_dir = os.path.join(rolling_dir, clean_wechat_id(wechat_id))
+    if not os.path.isdir(group_dir):
+        return []
+    partials = []
+    for name in os.listdir(group_dir):
+        stem, ext = os.path.splitext(name)
+        if ext != '.md':
+            continue
+        try:
+            start_ts, end_ts = (int(x) for x in stem.split('_'))
+        except ValueError:
+            continue
+        partials.append((start_ts, end_ts, os.path.join(group_dir, name)))
+    partials.sort()
+    return partials
+
+
+def write_atomic(path, content):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def format_range(start_ts, end_ts):
+    return (f"{datetime.fromtimestamp(start_ts).strftime('%Y-%m-%d %H:%M')}"
+            f"~{datetime.fromtimestamp(end_ts).strftime('%Y-%m-%d %H:%M')}")
+
+
+def summarize(combined_prompt, prefix, args, history_path):
+    """Run claude over the prompt (hedged if requested) and return the marked content or None"""
+    with stage('save_prompt'):
+        prompt_path = save_combined_prompt(combined_prompt, prefix)
+    print(f"Combined prompt saved to: {prompt_path}")
+    env = build_claude_env()
+    if args.hedge:
+        hedge_delay = hedge_delay_from_history(args.hedge_percentile, args.hedge_delay, history_path)
+        with stage('claude'):
+            msg, elapsed = run_claude_hedged(prompt_path, env, hedge_delay, args.max_attempts)
+        if msg is not None:
+            save_latency_sample(elapsed, history_path)
+        return msg
+    with stage('claude'):
+        output = run_claude(prompt_path, env)
+    with stage('extract'):
+        return extract_marked_content(output)
+
+
+def unsummarized_since(partials, window_start):
+    """Only messages newer than the latest partial still need summarizing"""
+    if partials:
+        return max(window_start, datetime.fromtimestamp(partials[-1][1] + 1))
+    return window_start
+
+
+def read_chatlog(args, wechat_id, since, now):
+    """Read, filter and alias-rewrite the archived messages in [since, now]; returns (messages, text)"""
+    with stage('read_archive'):
+        messages = read_messages(args.archive_dir, wechat_id, since, now)
+        chatlog_text = render_markdown(messages)
+    with stage('filter'):
+        if args.rules:
+            chatlog_filter = ChatlogFilter.from_file(args.rules, extra_senders=args.nouser)
+        else:
+            chatlog_filter = ChatlogFilter(senders=args.nouser)
+        if chatlog_filter:
+            chatlog_text = chatlog_filter.filter_text(chatlog_text)
+    if args.aliases and chatlog_text.strip():
+        # Names come from the contact cache refreshed by getrecentchatlogs.py --aliases; no network here
+        from contact_cache import ContactCache
+
+        with stage('aliases'):
+            chatlog_text = ContactCache(ttl_hours=float('inf')).rewrite_chatlog(wechat_id, chatlog_text)
+    return messages, chatlog_text
+
+
+def cmd_update(args):
+    now = current_time()
+    partials = list_partials(args.rolling_dir, args.wechat_id)
+    since = unsummarized_since(partials, now - timedelta(hours=args.window))
+    messages, chatlog_text = read_chatlog(args, args.wechat_id, since, now)
+
+    if len(messages) < args.min_messages or not chatlog_text.strip():
+        print(f"{args.wechat_id}: {len(messages)} new messages since {since:%Y-%m-%d %H:%M}, nothing to summarize")
+        return 0
+
+    start_ts, end_ts = messages[0].ts, messages[-1].ts
+    if args.prompt:
+        with open(args.prompt, 'r', encoding='utf-8') as f:
+            prompt_content = f.read()
+    else:
+        prompt_content = DEFAULT_PARTIAL_PROMPT
+    with stage('build_prompt'):
+        combined_prompt = build_combined_prompt(
+            prompt_content, [(f"{args.wechat_id} {format_range(start_ts, end_ts)}", chatlog_text)])
+
+    print(f"{args.wechat_id}: summarizing {len(messages)} messages ({format_range(start_ts, end_ts)})")
+    msg = summarize(combined_prompt, f"rolling_prompt_{clean_wechat_id(args.wechat_id)}", args,
+                    UPDATE_LATENCY_HISTORY_FILE)
+    if not msg:
+        print("Error: No content found between <!-- start --> and <!-- end --> markers")
+        return 1
+
+    group_dir = os.path.join(args.rolling_dir, clean_wechat_id(args.wechat_id))
+    os.makedirs(group_dir, exist_ok=True)
+    partial_path = os.path.join(group_dir, f"{start_ts}_{end_ts}.md")
+    write_atomic(partial_path, msg)
+    print(f"Partial summary saved to: {partial_path}")
+
+    # Drop partials that can no longer fall inside a merge window
+    expire_ts = int((now - timedelta(days=args.keep_days)).timestamp())
+    for _, old_end, path in partials:
+        if old_end < expire_ts:
+            os.remove(path)
+    return 0
+
+
+def cmd_merge(args):
+    if not os.path.exists(args.prompt):
+        print(f"Error: {args.prompt} not found")
+        return 1
+
+    now = current_time()
+    window_start = now - timedelta(hours=args.window)
+    window_start_ts = int(window_start.timestamp())
+    sections = []
+    partial_count = raw_count = 0
+    for wechat_id in args.wechat_ids:
+        partials = [p for p in list_partials(args.rolling_dir, wechat_id) if p[1] >= window_start_ts]
+        if not partials:
+            print(f"Warning: no partial summaries for {wechat_id} in the last {args.window} hours")
+        for start_ts, end_ts, path in partials:
+            with open(path, 'r', encoding='utf-8') as f:
+                sections.append((f"{wechat_id} {format_range(start_ts, end_ts)}", f.read()))
+        partial_count += len(partials)
+
+        # The tail since the last partial goes in raw, so sending needs no separate update call
+        messages, chatlog_text = read_chatlog(args, wechat_id, unsummarized_since(partials, window_start), now)
+        if messages and chatlog_text.strip():
+            title = f"{wechat_id} {format_range(messages[0].ts, messages[-1].ts)} {RAW_SECTION_SUFFIX}"
+            sections.append((title, chatlog_text))
+            raw_count += len(messages)
+
+    if not sections:
+        print("Error: No partial summaries or archived messages found")
+        return 1
+
+    with open(args.prompt, 'r', encoding='utf-8') as f:
+        prompt_content = f.read()
+    with stage('build_prompt'):
+        combined_prompt = build_combined_prompt(prompt_content, sections, [('merge', MERGE_PREAMBLE)])
+
+    print(f"Merging {partial_count} partial summaries and {raw_count} unsummarized messages "
+          f"from {len(args.wechat_ids)} groups")
+    start = time.monotonic()
+    msg = summarize(combined_prompt, "merge_prompt", args, MERGE_LATENCY_HISTORY_FILE)
+    if not msg:
+        print("Error: No content found between <!-- start --> and <!-- end --> markers")
+        return 1
+
+    write_atomic(args.output, msg)
+    print(f"Merge complete in {time.monotonic() - start:.1f}s. Results saved to: {args.output}")
+    return 0
+
+
+def add_chatlog_options(parser):
+    parser.add_argument('-d', '--archive-dir', default='archive',
+                        help='Chatlog archive directory (default: archive)')
+    parser.add_argument('--nouser', action='append', default=[],
+                        help='User ID to skip, can be repeated')
+    parser.add_argument('--rules', default='', help='Filter rule file (see chatlog_filter.py)')
+    parser.add_argument('--aliases', action='store_true',
+                        help='Rewrite senders to short aliases with a legend (see getrecentchatlogs.py --aliases)')
+
+
+def add_claude_options(parser):
+    parser.add_argument('--rolling-dir', default='rolling',
+                        help='Directory for partial summaries (default: rolling)')
+    parser.add_argument('--window', type=float, default=30,
+                        help='Summary window in hours (default: 30)')
+    parser.add_argument('--hedge', action='store_true',
+                        help='Use hedged claude attempts (see analyze_logs.py --hedge)')
+    parser.add_argument('--max-attempts', type=int, default=3,
+                        help='Total claude attempts in hedge mode (default: 3)')
+    parser.add_argument('--hedge-percentile', type=float, default=90,
+                        help='Latency percentile of past runs that triggers the hedge (default: 90)')
+    parser.add_argument('--hedge-delay', type=float, default=180,
+                        help='Hedge delay in seconds until enough latency history exists (default: 180)')
+    add_profile_argument(parser)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental rolling summaries of archived chatlogs')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    update_parser = sub.add_parser('update', help='Summarize new archived messages of one group')
+    update_parser.add_argument('-wid', '--wechat-id', required=True, help='WeChat group ID')
+    update_parser.add_argument('-p', '--prompt', default='',
+                               help='Prompt file for partial summaries (default: built-in prompt)')
+    update_parser.add_argument('--min-messages', type=int, default=1,
+                               help='Skip the update below this many new messages (default: 1)')
+    update_parser.add_argument('--keep-days', type=float, default=7,
+                               help='Delete partial summaries older than this (default: 7)')
+    add_chatlog_options(update_parser)
+    add_claude_options(update_parser)
+
+    merge_parser = sub.add_parser('merge', help='Merge partial summaries into the final result')
+    merge_parser.add_argument('-p', '--prompt', required=True, help='Prompt file for the final summary')
+    merge_parser.add_argument('-o', '--output', required=True, help='Output filename')
+    merge_parser.add_argument('-wid', '--wechat-ids', nargs='+', required=True, help='WeChat group IDs')
+    add_chatlog_options(merge_parser)
+    add_claude_options(merge_parser)
+
+    args = parser.parse_args()
+    enable_profiling(args.profile)
+
+    try:
+        if args.command == 'update':
+            sys.exit(cmd_update(args))
+        sys.exit(cmd_merge(args))
+    except subprocess.CalledProcessError as e:
+        print(f"Error running claude command: {e}")
+        print(f"Command output: {e.stdout}")
+        print(f"Command error: {e.stderr}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -34,6 +34,14 @@ input_prompt="ai_prompt.md"
 gen_podcast_prompt="gen_podcast_prompt.md"
 
 ignore_user="bushcraftsecret"  # 要忽略的用户微信ID，为空则不过滤任何用户
+filter_rules="filter_rules.yml"  # 过滤规则文件（发送者/关键词/正则/消息类型），不存在则跳过
+sender_aliases=true  # 发送者改写为短别名并附对照表（联系人缓存），减少prompt长度
+tts_workers=2  # 播客并行合成进程数；每个进程都会加载一次完整TTS模型，按内存/显存调整
+
+# 增量滚动摘要：需要 update_rolling_summary.sh 每隔几小时运行，发送时只合并分段摘要
+rolling_mode=false
+archive_dir="archive"
+rolling_dir="rolling"
 
 # 时间和文件名配置
 hours=30  # 默认获取最近30小时的聊天记录
@@ -132,6 +140,16 @@ fetch_chat_logs() {
             get_logs_cmd+=" --nouser \"$ignore_user\""
             debug_echo "忽略用户: $ignore_user"
         fi
+        if [ -f "$filter_rules" ]; then
+            get_logs_cmd+=" --rules \"$filter_rules\""
+            debug_echo "过滤规则文件: $filter_rules"
+        fi
+        if [ "$sender_aliases" = true ]; then
+            get_logs_cmd+=" --aliases"
+        fi
+        if [ "$rolling_mode" = true ]; then
+            get_logs_cmd+=" --archive \"$archive_dir\""
+        fi
         
         debug_echo "执行命令: $get_logs_cmd"
         
@@ -178,74 +196,103 @@ check_output_file() {
 }
 
 # ==============================================================================
-# 步骤2: AI分析聊天记录（带重试机制）
+# 步骤2: AI分析聊天记录
 # ==============================================================================
 analyze_logs() {
     info_echo "开始AI分析聊天记录..."
     
-    local max_retries=2
-    local attempt=1
+    # analyze_logs.py 在 --hedge 模式下内部完成最多 hedge_attempts 次对冲尝试，
+    # 慢请求超过历史延迟分位数时并行启动新尝试，首个有效结果胜出，失败的尝试立即替换，因此只调用一次
+    local hedge_attempts=3
     
-    while [ $attempt -le $((max_retries + 1)) ]; do
-        info_echo "AI分析尝试 $attempt/$((max_retries + 1))"
-        
-        # 如果不是第一次尝试，先删除可能存在的空文件
-        if [ $attempt -gt 1 ] && [ -f "$output_file" ]; then
-            rm -f "$output_file"
-            debug_echo "删除之前的输出文件"
-        fi
-        
-        # 构建analyze_logs.py的参数
-        local analyze_cmd="python3 analyze_logs.py -p \"$input_prompt\" -o \"$output_file\""
-        
-        # 添加所有日志文件作为单个-i参数的输入
-        if [ ${#log_files[@]} -gt 0 ]; then
-            analyze_cmd+=" -i"
-            for log_file in "${log_files[@]}"; do
-                analyze_cmd+=" \"$log_file\""
-            done
-        fi
-        
-        debug_echo "执行命令: $analyze_cmd"
-        
-        # 执行分析
-        local cmd_exit_code=0
-        eval "$analyze_cmd" || cmd_exit_code=$?
-        
-        if [ $cmd_exit_code -eq 0 ]; then
-            # analyze_logs.py 执行成功，检查输出文件是否有效
-            if check_output_file "$output_file"; then
-                info_echo "AI分析完成，结果保存到: $output_file"
-                
-                # 显示输出文件信息
-                local file_size=$(stat -f%z "$output_file" 2>/dev/null || stat -c%s "$output_file" 2>/dev/null || echo "未知")
-                debug_echo "输出文件大小: $file_size 字节"
-                
-                return 0
-            else
-                error_echo "分析完成但输出文件无效或为空"
-            fi
+    # 构建analyze_logs.py的参数
+    local analyze_cmd="python3 analyze_logs.py -p \"$input_prompt\" -o \"$output_file\" --hedge --max-attempts $hedge_attempts"
+    
+    # 添加所有日志文件作为单个-i参数的输入
+    if [ ${#log_files[@]} -gt 0 ]; then
+        analyze_cmd+=" -i"
+        for log_file in "${log_files[@]}"; do
+            analyze_cmd+=" \"$log_file\""
+        done
+    fi
+    
+    debug_echo "执行命令: $analyze_cmd"
+    
+    # 执行分析
+    local cmd_exit_code=0
+    eval "$analyze_cmd" || cmd_exit_code=$?
+    
+    if [ $cmd_exit_code -eq 0 ]; then
+        # analyze_logs.py 执行成功，检查输出文件是否有效
+        if check_output_file "$output_file"; then
+            info_echo "AI分析完成，结果保存到: $output_file"
+            
+            # 显示输出文件信息
+            local file_size=$(stat -f%z "$output_file" 2>/dev/null || stat -c%s "$output_file" 2>/dev/null || echo "未知")
+            debug_echo "输出文件大小: $file_size 字节"
+            
+            return 0
         else
-            error_echo "AI分析命令执行失败 (退出码: $cmd_exit_code)"
-        fi
-        
-        # 如果不是最后一次尝试，等待一下再重试
-        if [ $attempt -lt $((max_retries + 1)) ]; then
-            info_echo "等待5秒后重试..."
-            sleep 5
+            error_echo "分析完成但输出文件无效或为空"
         fi
-        
-        attempt=$((attempt + 1))
-    done
+    else
+        error_echo "AI分析命令执行失败 (退出码: $cmd_exit_code)"
+    fi
     
-    error_echo "AI分析在 $((max_retries + 1)) 次尝试后仍然失败"
+    error_echo "AI分析在 $hedge_attempts 次对冲尝试后仍然失败"
     
     # 发送错误通知到微信群
-    send_error_message "Claude AI分析在${max_retries}次重试后仍然失败，输出文件为空或不存在。请检查网络连接、Claude配置或输入数据格式"
+    send_error_message "Claude AI分析在${hedge_attempts}次对冲尝试后仍然失败，输出文件为空或不存在。请检查网络连接、Claude配置或输入数据格式"
     
     return 1
 }
 
+# ==============================================================================
+# 步骤2（增量模式）: 分段摘要和之后的新消息一次合并
+# ==============================================================================
+rolling_analyze() {
+    info_echo "开始合并增量分段摘要..."
+    
+    # 只调用一次 claude: 分段摘要加上各群最后一个分段之后的原始新消息一起合并；
+    # 分段由 update_rolling_summary.sh 定时生成（最后一次安排在发送前不久），发送时不再单独补齐
+    local merge_cmd="python3 rolling_summary.py merge -p \"$input_prompt\" -o \"$output_file\" -d \"$archive_dir\" --rolling-dir \"$rolling_dir\" --window $hours --hedge"
+    if [ -n "$ignore_user" ]; then
+        merge_cmd+=" --nouser \"$ignore_user\""
+    fi
+    if [ -f "$filter_rules" ]; then
+        merge_cmd+=" --rules \"$filter_rules\""
+    fi
+    if [ "$sender_aliases" = true ]; then
+        merge_cmd+=" --aliases"
+    fi
+    merge_cmd+=" -wid"
+    local group_id
+    for group_id in "${group_source_ids[@]}"; do
+        merge_cmd+=" \"$group_id\""
+    done
+    debug_echo "执行命令: $merge_cmd"
+    
+    if eval "$merge_cmd" && check_output_file "$output_file"; then
+        info_echo "增量摘要合并完成，结果保存到: $output_file"
+        return 0
+    fi
+    
+    error_echo "增量摘要合并失败"
+    return 1
+}
+
+# ==============================================================================
+# 步骤2: AI分析入口，增量模式失败时回退到完整分析
+# ==============================================================================
+run_analysis() {
+    if [ "$rolling_mode" = true ]; then
+        if rolling_analyze; then
+            return 0
+        fi
+        info_echo "回退到完整AI分析..."
+    fi
+    analyze_logs
+}
 
 # ==============================================================================
 # 步骤3: 生成播客脚本（带重试机制）
@@ -367,63 +414,35 @@ gen_podcast_mp3_url() {
         return 1
     fi
     
-    # 获取播客脚本的绝对路径（在切换目录之前）
-    local abs_podcast_script="$(pwd)/$podcast_script"
-    
-    # 切换到tts_home目录
-    debug_echo "切换到TTS目录: $tts_home"
-    cd "$tts_home" || {
-        error_echo "无法切换到TTS目录: $tts_home"
-        return 1
-    }
-    
-    # 运行TTS生成命令
+    # 解析带情绪标签的脚本，按段并行合成（按文本/情绪/强度/音色缓存），再按顺序拼接为MP3
     info_echo "开始生成TTS音频文件..."
-    # local tts_cmd="uv run gentts_emo.py --all -v ning.wav -f \"$abs_podcast_script\" -o \"$mp3_full_path\""
-    # debug_echo "执行TTS命令: $tts_cmd"
+    local tts_cmd="python3 podcast_tts.py -i \"$podcast_script\" -o \"$mp3_full_path\" --tts-home \"$tts_home\" -v ning.wav -j $tts_workers"
+    debug_echo "执行TTS命令: $tts_cmd"
     
-    # 执行TTS命令并等待完成
-    # if eval "$tts_cmd"; then
-    #    info_echo "TTS命令执行完成"
-    #else
-    #    error_echo "TTS命令执行失败"
-    #    cd - > /dev/null  # 切换回原目录
-    #    return 1
-    #fi
-    
-    # 切换回原目录
-    cd - > /dev/null
+    if ! eval "$tts_cmd"; then
+        error_echo "TTS命令执行失败"
+        return 1
+    fi
     
     # 检查mp3文件是否成功生成
-    local max_wait=300  # 最多等待5分钟
-    local wait_count=0
-    local check_interval=5  # 每5秒检查一次
-    
-    info_echo "检查MP3文件生成状态..."
-    while [ $wait_count -lt $max_wait ]; do
-        if [ -f "$mp3_full_path" ] && [ -s "$mp3_full_path" ]; then
-            info_echo "MP3文件生成成功: $mp3_full_path"
-            
-            # 显示文件信息
-            local file_size=$(stat -f%z "$mp3_full_path" 2>/dev/null || stat -c%s "$mp3_full_path" 2>/dev/null || echo "未知")
-            debug_echo "MP3文件大小: $file_size 字节"
-            
-            # 返回MP3访问URL
-            local mp3_access_url="$mp3_url/$mp3file.mp3"
-            info_echo "MP3访问URL: $mp3_access_url"
-            echo "$mp3_access_url"
-            
-            podcast_url="$mp3_access_url"
-            
-            return 0
-        fi
+    if [ -f "$mp3_full_path" ] && [ -s "$mp3_full_path" ]; then
+        info_echo "MP3文件生成成功: $mp3_full_path"
         
-        debug_echo "等待MP3文件生成... ($wait_count/$max_wait 秒)"
-        sleep $check_interval
-        wait_count=$((wait_count + check_interval))
-    done
+        # 显示文件信息
+        local file_size=$(stat -f%z "$mp3_full_path" 2>/dev/null || stat -c%s "$mp3_full_path" 2>/dev/null || echo "未知")
+        debug_echo "MP3文件大小: $file_size 字节"
+        
+        # 返回MP3访问URL
+        local mp3_access_url="$mp3_url/$mp3file.mp3"
+        info_echo "MP3访问URL: $mp3_access_url"
+        echo "$mp3_access_url"
+        
+        podcast_url="$mp3_access_url"
+        
+        return 0
+    fi
     
-    error_echo "MP3文件生成超时或失败: $mp3_full_path"
+    error_echo "MP3文件生成失败: $mp3_full_path"
  
     return 1
 }
@@ -546,6 +565,7 @@ main() {
         info_echo "  忽略用户: 无"
     fi
     info_echo "  输出文件: $output_file"
+    info_echo "  增量模式: $rolling_mode"
     info_echo "========================================"
     
     # 步骤执行
@@ -553,7 +573,7 @@ main() {
     
     fetch_chat_logs
     
-    if analyze_logs; then
+    if run_analysis; then
         # 生成播客脚本
         info_echo "开始播客生成流程..."
         podcast_script_file="podcast_script_${today_str}.md"
@@ -616,6 +636,23 @@ trap 'handle_error $? $LINENO' ERR
 # 参数解析
 hours=30  # 默认值
 
+# --profile [DIR]: getopts 不支持长参数，先取出；导出后流水线中每个Python脚本都按阶段剖析
+remaining_args=()
+while [ $# -gt 0 ]; do
+    if [ "$1" = "--profile" ]; then
+        if [ -n "$2" ] && [[ "$2" != -* ]]; then
+            export CLAUDE_WECHAT_PROFILE="$2"
+            shift
+        else
+            export CLAUDE_WECHAT_PROFILE="profiles/${date_str}"
+        fi
+    else
+        remaining_args+=("$1")
+    fi
+    shift
+done
+set -- "${remaining_args[@]}"
+
 while getopts "ht:" opt; do
     case $opt in
         h)
@@ -628,6 +665,7 @@ while getopts "ht:" opt; do
             echo "  -h             显示此帮助信息"
             echo "  -t HOURS       指定获取最近多少小时的数据 (默认: 30小时)"
             echo "  --no-debug     关闭调试信息"
+            echo "  --profile [DIR] 按阶段剖析各Python脚本，火焰图和报告写入 DIR (默认: profiles/<运行时间>)"
             echo ""
             echo "示例:"
             echo "  $0             # 获取最近30小时的数据"
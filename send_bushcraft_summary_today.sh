@@ -25,6 +25,7 @@ declare -a group_send_ids=(
 )
 input_prompt="bushcraft_prompt.md"
 ignore_user="bushcraftsecret"  # 要忽略的用户微信ID，为空则不过滤任何用户
+filter_rules="filter_rules.yml"  # 过滤规则文件（发送者/关键词/正则/消息类型），不存在则跳过
 
 # 时间和文件名配置
 hours=30  # 获取最近30小时的聊天记录
@@ -120,6 +121,10 @@ fetch_chat_logs() {
             get_logs_cmd+=" --nouser \"$ignore_user\""
             debug_echo "忽略用户: $ignore_user"
         fi
+        if [ -f "$filter_rules" ]; then
+            get_logs_cmd+=" --rules \"$filter_rules\""
+            debug_echo "过滤规则文件: $filter_rules"
+        fi
         
         debug_echo "执行命令: $get_logs_cmd"
         
@@ -315,6 +320,23 @@ trap 'handle_error $? $LINENO' ERR
 # ==============================================================================
 # 脚本入口
 # ==============================================================================
+# --profile [DIR]: 先取出，其余参数按原方式检查；导出后流水线中每个Python脚本都按阶段剖析
+remaining_args=()
+while [ $# -gt 0 ]; do
+    if [ "$1" = "--profile" ]; then
+        if [ -n "$2" ] && [[ "$2" != -* ]]; then
+            export CLAUDE_WECHAT_PROFILE="$2"
+            shift
+        else
+            export CLAUDE_WECHAT_PROFILE="profiles/${date_str}"
+        fi
+    else
+        remaining_args+=("$1")
+    fi
+    shift
+done
+set -- "${remaining_args[@]}"
+
 # 检查参数
 if [ "$1" = "--help" ] || [ "$1" = "-h" ]; then
     echo "微信AI总结工作流脚本"
@@ -324,6 +346,7 @@ if [ "$1" = "--help" ] || [ "$1" = "-h" ]; then
     echo "选项:"
     echo "  --help, -h     显示此帮助信息"
     echo "  --no-debug     关闭调试信息"
+    echo "  --profile [DIR] 按阶段剖析各Python脚本，火焰图和报告写入 DIR (默认: profiles/<运行时间>)"
     echo ""
     echo "功能:"
     echo "  1. 从多个微信群获取聊天记录"
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+gentts_emo 常驻合成进程
+podcast_tts.py 的每个进程池 worker 在 TTS 目录中用 `uv run python tts_worker.py` 启动一个本进程，
+gentts_emo 只导入一次，模型留在本进程内存中，之后逐行从标准输入读取 JSON 请求:
+    {"script": 单行脚本文件, "voice": 音色, "output": 输出MP3}
+每个请求用与命令行相同的参数在本进程内调用 gentts_emo，完成后在标准输出写一行 JSON 应答:
+    {"ok": true} 或 {"ok": false, "error": "..."}
+gentts_emo 自身的输出转到标准错误，不会混入应答。标准输入关闭（worker 退出）时本进程随之退出。
+"""
+
+import json
+import os
+import runpy
+import sys
+import traceback
+
+
+def main():
+    # 应答走原标准输出的副本，之后 fd 1 指向标准错误
+    replies = os.fdopen(os.dup(sys.stdout.fileno()), 'w', encoding='utf-8', buffering=1)
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    sys.path.insert(0, os.getcwd())
+    import gentts_emo
+
+    entry = getattr(gentts_emo, 'main', None)
+    for line in sys.stdin:
+        request = json.loads(line)
+        sys.argv = ['gentts_emo.py', '--all', '-v', request['voice'],
+                    '-f', request['script'], '-o', request['output']]
+        try:
+            if entry is not None:
+                entry()
+            else:
+                # 没有 main() 入口时退回按脚本执行，每个请求都会重新加载模型
+                runpy.run_path('gentts_emo.py', run_name='__main__')
+            reply = {'ok': True}
+        except SystemExit as e:
+            reply = {'ok': True} if e.code in (None, 0) else {'ok': False, 'error': f"退出码 {e.code}"}
+        except Exception:
+            reply = {'ok': False, 'error': traceback.format_exc()}
+        sys.stdout.flush()
+        replies.write(json.dumps(reply, ensure_ascii=False) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/bin/bash
+
+# 设置crontab兼容的环境变量
+export PATH="/opt/homebrew/bin:$PATH"
+export PATH=/Users/bruce/Library/Python/3.9/bin:$PATH
+
+export ANTHROPIC_BASE_URL="https://gaccode.com/claudecode"
+export NODE_EXTRA_CA_CERTS="/opt/homebrew/lib/node_modules/@anthropic-ai/claude-code/ca.pem"
+
+# 切换到脚本所在目录（crontab兼容）
+cd "$(dirname "$0")"
+
+source venv/bin/activate
+
+# ==============================================================================
+# 增量滚动摘要更新脚本
+# 功能：定时（如每4小时）抓取各群新消息写入归档，并为新消息生成分段摘要，
+#       send_ai_summary.sh 在 rolling_mode=true 时发送前只需合并这些分段摘要（一次 claude 调用）
+# 把其中一次运行安排在发送前不久，发送时合并的原始新消息就很少，例如 08:00 发送时:
+# 用法: ./update_rolling_summary.sh [--profile [DIR]]
+# crontab 示例: 30 3-23/4 * * * cd /path/to/claude_wechat && ./update_rolling_summary.sh >> /tmp/rolling.log 2>&1
+# ==============================================================================
+
+# 配置变量（与 send_ai_summary.sh 保持一致）
+declare -a group_source_ids=(
+    "27587714869@chatroom"
+    "43543695744@chatroom"
+    "2525118451@chatroom"
+)
+
+ignore_user="bushcraftsecret"  # 要忽略的用户微信ID，为空则不过滤任何用户
+filter_rules="filter_rules.yml"  # 过滤规则文件，不存在则跳过
+sender_aliases=true  # 发送者改写为短别名并附对照表（联系人缓存）
+archive_dir="archive"
+rolling_dir="rolling"
+
+window_hours=30   # 摘要窗口，与 send_ai_summary.sh 的 hours 一致
+
+info_echo() {
+    echo "[INFO $(date '+%H:%M:%S')] $1"
+}
+
+error_echo() {
+    echo "[ERROR $(date '+%H:%M:%S')] $1" >&2
+}
+
+main() {
+    info_echo "开始更新增量滚动摘要"
+
+    # --resume 从归档中最新消息前1小时接着抓（不早于摘要窗口），上次失败或漏跑的时段一并补上；
+    # 抓取失败时跳过该群的摘要，分段摘要只会覆盖已写入归档的消息
+    local tmp_log="rolling_fetch_$(date '+%Y%m%d_%H%M%S').md"
+    local failed=0
+
+    for group_id in "${group_source_ids[@]}"; do
+        info_echo "处理群 $group_id"
+
+        # --aliases 顺带按 TTL 刷新联系人缓存，归档中保存的仍是原始发送者
+        local fetch_args=()
+        if [ "$sender_aliases" = true ]; then
+            fetch_args+=(--aliases)
+        fi
+        if ! python3 getrecentchatlogs.py -wid "$group_id" -o "$tmp_log" -t $window_hours --archive "$archive_dir" --resume "${fetch_args[@]}"; then
+            error_echo "获取群 $group_id 的聊天记录失败"
+            failed=1
+            continue
+        fi
+        rm -f "$tmp_log"
+
+        local update_cmd="python3 rolling_summary.py update -d \"$archive_dir\" --rolling-dir \"$rolling_dir\" -wid \"$group_id\" --window $window_hours --hedge"
+        if [ -n "$ignore_user" ]; then
+            update_cmd+=" --nouser \"$ignore_user\""
+        fi
+        if [ -f "$filter_rules" ]; then
+            update_cmd+=" --rules \"$filter_rules\""
+        fi
+        if [ "$sender_aliases" = true ]; then
+            update_cmd+=" --aliases"
+        fi
+
+        if ! eval "$update_cmd"; then
+            error_echo "群 $group_id 的分段摘要生成失败"
+            failed=1
+        fi
+    done
+
+    if [ $failed -ne 0 ]; then
+        error_echo "部分群更新失败，下次运行会自动补齐"
+        exit 1
+    fi
+
+    info_echo "增量滚动摘要更新完成"
+}
+
+# --profile [DIR]: 导出后流水线中每个Python脚本都按阶段剖析
+date_str=$(date '+%Y%m%d_%H%M%S')
+remaining_args=()
+while [ $# -gt 0 ]; do
+    if [ "$1" = "--profile" ]; then
+        if [ -n "$2" ] && [[ "$2" != -* ]]; then
+            export CLAUDE_WECHAT_PROFILE="$2"
+            shift
+        else
+            export CLAUDE_WECHAT_PROFILE="profiles/${date_str}"
+        fi
+    else
+        remaining_args+=("$1")
+    fi
+    shift
+done
+set -- "${remaining_args[@]}"
+
+main